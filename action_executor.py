@@ -0,0 +1,341 @@
+import asyncio
+import logging
+import re
+import time
+
+from cancellation import unless_cancelled
+from metrics import process_metrics
+from results import ActionResult, Outcome
+
+# aiohttp and discord.py are imported where they are used, so the UI can read
+# these defaults without loading them
+
+DEFAULT_MAX_IN_FLIGHT = 5
+DEFAULT_REASON = "Bulk removal via bot"
+
+# Discord accepts at most this many user IDs per bulk-ban request
+BULK_BAN_LIMIT = 200
+
+# Backoff bounds (seconds) applied after Discord answers with a 429
+MIN_BACKOFF = 0.5
+MAX_BACKOFF = 10.0
+
+# Statuses Discord answers successful actions with; discord.py does not expose them
+KICK_BAN_STATUS = 204
+BULK_BAN_STATUS = 200
+
+_API_PREFIX = re.compile(r"^/api/v\d+")
+_TARGET_SEGMENT = re.compile(r"/(members|bans)/\d+")
+
+
+def route_key(method, path):
+    """Normalise a request to the route its rate-limit bucket is shared by"""
+    path = _API_PREFIX.sub("", path)
+    path = _TARGET_SEGMENT.sub(lambda m: f"/{m.group(1)}/{{id}}", path)
+    return f"{method.upper()} {path}"
+
+
+class RateLimitTracker:
+    """Tracks the rate-limit bucket headers Discord returns on each response
+
+    Request latencies, statuses and bucket waits are also recorded on
+    ``metrics``, the process-wide registry unless another is given.
+    """
+
+    def __init__(self, metrics=None):
+        self.buckets = {}
+        self.global_reset_at = 0.0
+        self.rate_limited_count = 0
+        self.metrics = metrics or process_metrics
+
+    def trace_config(self):
+        """Return an aiohttp trace config to pass as ``http_trace`` to a client"""
+        import aiohttp
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_end.append(self._on_request_end)
+        trace.on_request_exception.append(self._on_request_exception)
+        return trace
+
+    async def _on_request_start(self, session, context, params):
+        context.started_at = time.perf_counter()
+
+    async def _on_request_end(self, session, context, params):
+        self.record(params.method, params.url.path, params.response.status, params.response.headers)
+        self.metrics.observe_request(
+            route_key(params.method, params.url.path), params.response.status, time.perf_counter() - context.started_at
+        )
+
+    async def _on_request_exception(self, session, context, params):
+        self.metrics.observe_request(route_key(params.method, params.url.path), None, time.perf_counter() - context.started_at)
+
+    def record(self, method, path, status, headers):
+        """Update bucket state from one response"""
+        now = time.monotonic()
+        route = route_key(method, path)
+
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        if remaining is not None and reset_after is not None:
+            self.buckets[route] = (int(remaining), now + float(reset_after))
+
+        if status == 429:
+            self.rate_limited_count += 1
+            retry_after = float(headers.get("Retry-After") or reset_after or 1)
+            if headers.get("X-RateLimit-Global") or headers.get("X-RateLimit-Scope") == "global":
+                self.global_reset_at = max(self.global_reset_at, now + retry_after)
+            else:
+                self.buckets[route] = (0, now + retry_after)
+
+    async def acquire(self, route):
+        """Wait until the bucket for ``route`` has capacity, then reserve one request"""
+        started = time.perf_counter()
+        while True:
+            now = time.monotonic()
+            delay = self.global_reset_at - now
+            bucket = self.buckets.get(route)
+            if bucket:
+                remaining, reset_at = bucket
+                if reset_at <= now:
+                    # Bucket window elapsed; the next response will refill it
+                    del self.buckets[route]
+                elif remaining <= 0:
+                    delay = max(delay, reset_at - now)
+                else:
+                    self.buckets[route] = (remaining - 1, reset_at)
+
+            if delay <= 0:
+                self.metrics.observe_bucket_wait(route, time.perf_counter() - started)
+                return
+            await asyncio.sleep(delay)
+
+
+def can_bulk_ban(guild):
+    """Check whether the bot may use the bulk-ban endpoint (Ban Members and Manage Server)"""
+    me = getattr(guild, "me", None)
+    if me is None:
+        return False
+    permissions = me.guild_permissions
+    return permissions.ban_members and permissions.manage_guild
+
+
+class ActionExecutor:
+    """Runs kick/ban calls with bounded, adaptive concurrency
+
+    Up to ``max_in_flight`` requests run at once. Each request waits for its
+    rate-limit bucket, and every 429 halves the concurrency and raises a
+    shared backoff that decays again as requests succeed.
+
+    With ``bulk_ban`` set, ban runs are sent to the bulk-ban endpoint in
+    batches of up to ``BULK_BAN_LIMIT`` users instead. That endpoint also
+    needs Manage Server, so without it bans fall back to one request each.
+
+    A ``cancel_token`` is checked before every request and interrupts slot,
+    backoff and rate-limit waits; requests already sent are allowed to finish.
+    """
+
+    def __init__(self, guild, action_type="kick", max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 tracker=None, reason=DEFAULT_REASON, delete_message_days=None, bulk_ban=False,
+                 cancel_token=None):
+        self.guild = guild
+        self.action_type = action_type
+        self.bulk_ban = bulk_ban and action_type == "ban"
+        if self.bulk_ban and not can_bulk_ban(guild):
+            logging.warning("Bulk ban needs the Manage Server permission; banning users one at a time")
+            self.bulk_ban = False
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.tracker = tracker or RateLimitTracker()
+        self.reason = reason
+        self.delete_message_days = delete_message_days
+        self.cancel_token = cancel_token
+        self.not_attempted = []
+
+        self.limit = float(self.max_in_flight)
+        self.backoff = 0.0
+        self.in_flight = 0
+        self._slots = None
+        self._cancelled = None
+        self._seen_rate_limits = self.tracker.rate_limited_count
+
+        if action_type == "kick":
+            self.route = f"DELETE /guilds/{guild.id}/members/{{id}}"
+        elif action_type == "ban" and self.bulk_ban:
+            self.route = f"POST /guilds/{guild.id}/bulk-ban"
+        elif action_type == "ban":
+            self.route = f"PUT /guilds/{guild.id}/bans/{{id}}"
+        else:
+            raise ValueError(f"Unknown action type: {action_type}")
+
+    async def run(self, targets, on_result):
+        """Apply the action to each ``(label, member)`` target
+
+        ``on_result(result)`` is called once per target with an
+        ``ActionResult``, whose ``error`` is a short reason on failure.
+        Targets never sent because of cancellation get no result; they are
+        returned, and kept in ``not_attempted``.
+        """
+        metrics = self.tracker.metrics
+        processed = 0
+
+        def record_result(label, member, error, code=None, status=None, latency=None):
+            nonlocal processed
+            processed += 1
+            outcome = Outcome.FAILED if error else Outcome.REMOVED
+            metrics.record_user(self.action_type, outcome.value)
+            on_result(ActionResult(label, member.id, outcome, error, code, status, latency))
+
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self._slots = asyncio.Condition()
+        self._cancelled = loop.create_future()
+        callback = None
+        if self.cancel_token is not None:
+            self._cancelled, callback = self.cancel_token.future(loop)
+            self._cancelled.add_done_callback(lambda _: asyncio.ensure_future(self._wake_workers()))
+
+        try:
+            if self.bulk_ban:
+                await self._run_bulk_ban(targets, record_result)
+            else:
+                pending = iter(targets)
+                workers = [asyncio.create_task(self._worker(pending, record_result)) for _ in range(self.max_in_flight)]
+                await asyncio.gather(*workers)
+        finally:
+            if callback is not None:
+                self.cancel_token.remove_callback(callback)
+            metrics.record_run(processed, time.perf_counter() - started)
+
+        if self.not_attempted:
+            logging.info(f"Cancelled: {len(self.not_attempted)} users not attempted")
+        return self.not_attempted
+
+    async def _wake_workers(self):
+        async with self._slots:
+            self._slots.notify_all()
+
+    async def _worker(self, pending, on_result):
+        for label, member in pending:
+            if self._cancelled.done():
+                self.not_attempted.append((label, member))
+                continue
+
+            async with self._slots:
+                await self._slots.wait_for(lambda: self.in_flight < int(self.limit) or self._cancelled.done())
+                if self._cancelled.done():
+                    self.not_attempted.append((label, member))
+                    continue
+                self.in_flight += 1
+
+            error = code = status = latency = None
+            sent = False
+            try:
+                # Waits before the request are abandoned on cancel; the request itself is drained
+                if self.backoff and not await unless_cancelled(asyncio.sleep(self.backoff), self._cancelled):
+                    continue
+                if not await unless_cancelled(self.tracker.acquire(self.route), self._cancelled):
+                    continue
+
+                sent = True
+                started = time.perf_counter()
+                error, code, status = await self._apply(member)
+                latency = time.perf_counter() - started
+                self._adapt(error)
+            finally:
+                async with self._slots:
+                    self.in_flight -= 1
+                    self._slots.notify_all()
+                if not sent:
+                    self.not_attempted.append((label, member))
+
+            on_result(label, member, error, code, status, latency)
+
+    async def _run_bulk_ban(self, targets, on_result):
+        import discord
+
+        targets = list(targets)
+        for start in range(0, len(targets), BULK_BAN_LIMIT):
+            batch = {member.id: (label, member) for label, member in targets[start:start + BULK_BAN_LIMIT]}
+
+            if not await unless_cancelled(self.tracker.acquire(self.route), self._cancelled):
+                self.not_attempted.extend(targets[start:])
+                return
+            error = code = None
+            status = BULK_BAN_STATUS
+            started = time.perf_counter()
+            try:
+                result = await self.guild.bulk_ban(
+                    [member for _, member in batch.values()],
+                    reason=self.reason,
+                    delete_message_seconds=self._delete_message_seconds()
+                )
+            except discord.Forbidden as e:
+                error, code, status = "No permission", e.code, e.status
+            except discord.HTTPException as e:
+                error = "Rate limited" if e.status == 429 else f"Discord error: {str(e)}"
+                code, status = e.code, e.status
+            except Exception as e:
+                error, status = f"Error: {str(e)}", None
+            # Every user in the batch shares the one request's latency
+            latency = time.perf_counter() - started
+
+            if error:
+                logging.error(f"Bulk ban of {len(batch)} users failed: {error}")
+                for label, member in batch.values():
+                    on_result(label, member, error, code, status, latency)
+                continue
+
+            logging.info(f"Bulk banned {len(result.banned)} users, {len(result.failed)} failed")
+            for user in result.banned:
+                if user.id in batch:
+                    label, member = batch.pop(user.id)
+                    on_result(label, member, None, status=status, latency=latency)
+            for user in result.failed:
+                if user.id in batch:
+                    label, member = batch.pop(user.id)
+                    on_result(label, member, "Ban rejected by Discord", status=status, latency=latency)
+            for label, member in batch.values():
+                on_result(label, member, "Missing from bulk ban response", status=status, latency=latency)
+
+    def _delete_message_seconds(self):
+        if self.delete_message_days is None:
+            return 86400
+        return self.delete_message_days * 86400
+
+    async def _apply(self, member):
+        """Send one kick or ban; returns ``(error, code, status)``"""
+        import discord
+
+        try:
+            if self.action_type == "kick":
+                await self.guild.kick(member, reason=self.reason)
+                logging.info(f"Kicked user: {member.name}")
+            else:
+                if self.delete_message_days is None:
+                    await self.guild.ban(member, reason=self.reason)
+                else:
+                    await self.guild.ban(member, reason=self.reason, delete_message_days=self.delete_message_days)
+                logging.info(f"Banned user: {member.name}")
+            return None, None, KICK_BAN_STATUS
+        except discord.Forbidden as e:
+            return "No permission", e.code, e.status
+        except discord.HTTPException as e:
+            if e.status == 429:
+                return "Rate limited", e.code, e.status
+            return f"Discord error: {str(e)}", e.code, e.status
+        except Exception as e:
+            return f"Error: {str(e)}", None, None
+
+    def _adapt(self, error):
+        """Multiplicative decrease on each new 429, additive increase otherwise"""
+        observed = self.tracker.rate_limited_count
+        rate_limited = observed > self._seen_rate_limits or error == "Rate limited"
+        self._seen_rate_limits = observed
+
+        if rate_limited:
+            self.limit = max(1.0, self.limit / 2)
+            self.backoff = min(max(self.backoff * 2, MIN_BACKOFF), MAX_BACKOFF)
+            logging.warning(f"Rate limited: concurrency {int(self.limit)}, backoff {self.backoff:.1f}s")
+        else:
+            self.limit = min(float(self.max_in_flight), self.limit + 1 / self.limit)
+            self.backoff = self.backoff / 2 if self.backoff > MIN_BACKOFF / 8 else 0.0
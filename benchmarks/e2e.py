@@ -0,0 +1,194 @@
+"""End-to-end removal benchmarks against the fake Discord server
+
+Each scenario starts a fresh fake guild and runs one removal path in a child
+process, so peak RSS is measured per scenario:
+
+* ``remove_users`` - ``DiscordUserRemover.create_bot`` + ``remove_users``
+* ``job`` - the Streamlit execution path: shared ``BotSession`` and
+  ``run_removal_job`` on the job queue
+
+Reports users/sec, p50/p99 action request latency and peak RSS.
+
+    python -m benchmarks.e2e --members 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_discord import FAKE_TOKEN, GUILD_ID, FakeDiscordServer, member_name, use_fake_discord
+
+DEFAULT_MEMBERS = [1000, 10000, 100000]
+PATHS = ["remove_users", "job"]
+
+# Methods of the kick, ban and bulk-ban requests whose latency is reported
+_ACTION_METHODS = {"DELETE", "PUT", "POST"}
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def _timed_tracker():
+    """RateLimitTracker that also records the latency of every action request"""
+    from action_executor import RateLimitTracker
+
+    class TimedRateLimitTracker(RateLimitTracker):
+        def __init__(self):
+            super().__init__()
+            self.latencies = []
+
+        def trace_config(self):
+            trace = super().trace_config()
+            trace.on_request_end.append(self._on_action_end)
+            return trace
+
+        async def _on_action_end(self, session, context, params):
+            if params.method in _ACTION_METHODS and "/guilds/" in params.url.path:
+                self.latencies.append(time.perf_counter() - context.started_at)
+
+    return TimedRateLimitTracker()
+
+
+def run_remove_users(args, entries):
+    from remover import DiscordUserRemover
+
+    async def scenario():
+        remover = DiscordUserRemover(max_in_flight=args.max_in_flight)
+        remover.rate_limits = tracker = _timed_tracker()
+        setup_started = time.perf_counter()
+        if not await remover.create_bot(FAKE_TOKEN, GUILD_ID):
+            raise RuntimeError("Bot did not connect to the fake server")
+        started = time.perf_counter()
+        success, message = await remover.remove_users(entries, GUILD_ID, args.action, bulk_ban=args.bulk_ban)
+        finished = time.perf_counter()
+        await remover.disconnect()
+        if not success:
+            raise RuntimeError(message)
+        return started - setup_started, finished - started, remover.results.removed, remover.results.failed, tracker
+
+    return asyncio.run(scenario())
+
+
+def run_job(args, entries):
+    import bot_session
+    from job_queue import JobQueue
+    from remover import run_removal_job
+    from run_journal import RunJournal
+
+    setup_started = time.perf_counter()
+    session = bot_session.BotSession(FAKE_TOKEN)
+    session.rate_limits = tracker = _timed_tracker()
+    bot_session._sessions[FAKE_TOKEN] = session.start(timeout=120)
+
+    options = {"guild_id": GUILD_ID, "action_type": args.action, "max_in_flight": args.max_in_flight, "bulk_ban": args.bulk_ban}
+    journal = RunJournal.create(entries, options)
+    queue = JobQueue(run_removal_job)
+    started = time.perf_counter()
+    job = queue.result(queue.submit(entries, bot_token=FAKE_TOKEN, journal_path=journal.path, **options))
+    finished = time.perf_counter()
+    session.close()
+    if job.error:
+        raise RuntimeError(job.error)
+    return started - setup_started, finished - started, job.results.removed, job.results.failed, tracker
+
+
+def child(args):
+    """Run one scenario against ``args.url`` and print its metrics as JSON"""
+    os.chdir(tempfile.mkdtemp(prefix="discord-bench-"))
+    use_fake_discord(args.url)
+    entries = [member_name(index) for index in range(args.targets)]
+
+    runner = run_remove_users if args.path == "remove_users" else run_job
+    setup, elapsed, removed, failed, tracker = runner(args, entries)
+
+    print(json.dumps({
+        "setup_s": round(setup, 3),
+        "run_s": round(elapsed, 3),
+        "removed": removed,
+        "failed": failed,
+        "users_per_s": round((removed + failed) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(tracker.latencies, 0.50) * 1000, 2) if tracker.latencies else None,
+        "p99_ms": round(percentile(tracker.latencies, 0.99) * 1000, 2) if tracker.latencies else None,
+        "rate_limited": tracker.rate_limited_count,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def run_scenario(args, members, path):
+    targets = min(members, args.max_targets)
+    server = FakeDiscordServer(
+        members=members, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000, bucket_limit=args.bucket_limit
+    ).start()
+    try:
+        command = [
+            sys.executable, "-m", "benchmarks.e2e", "--child", "--url", server.url, "--path", path,
+            "--targets", str(targets), "--action", args.action, "--max-in-flight", str(args.max_in_flight)
+        ]
+        if args.bulk_ban:
+            command.append("--bulk-ban")
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")])))
+        output = subprocess.run(command, capture_output=True, text=True, env=env, timeout=args.timeout, cwd=repo_root)
+        if output.returncode != 0:
+            raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "child failed")
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+    finally:
+        server.stop()
+
+    result.update({"members": members, "path": path, "targets": targets, "server_429s": server.fake.stats["rate_limited"]})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end removal benchmarks against a fake Discord server")
+    parser.add_argument("--members", type=int, nargs="+", default=DEFAULT_MEMBERS)
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=PATHS)
+    parser.add_argument("--max-targets", type=int, default=5000, help="Users removed per scenario, at most")
+    parser.add_argument("--action", choices=["kick", "ban"], default="kick")
+    parser.add_argument("--bulk-ban", action="store_true")
+    parser.add_argument("--max-in-flight", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--bucket-limit", type=int, default=200, help="Requests per route per second before 429s")
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    # Internal: run one scenario in this process
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--path", choices=PATHS, help=argparse.SUPPRESS)
+    parser.add_argument("--targets", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    results = []
+    print(f"{'members':>8} {'path':<13} {'targets':>7} {'users/s':>8} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'429s':>5} {'setup s':>8} {'RSS MB':>7}")
+    for members in args.members:
+        for path in args.paths:
+            result = run_scenario(args, members, path)
+            results.append(result)
+            print(f"{members:>8} {path:<13} {result['targets']:>7} {result['users_per_s']:>8} "
+                  f"{result['p50_ms']!s:>7} {result['p99_ms']!s:>7} {result['server_429s']:>5} "
+                  f"{result['setup_s']:>8} {result['peak_rss_mb']:>7}", flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+"""Local stand-in for the Discord REST API and gateway used by the remover
+
+Serves login, the gateway handshake, member chunking and listing, kick,
+ban, bulk ban and prune for one synthetic guild, with configurable member count, latency
+and per-route rate-limit buckets that answer with realistic headers and 429s.
+
+Run standalone with ``python -m benchmarks.fake_discord --members 10000`` and
+point a client at it with ``use_fake_discord(url)``.
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import random
+import threading
+import time
+
+import yarl
+from aiohttp import WSMsgType, web
+
+API_PREFIX = "/api/v10"
+
+# Snowflakes of the synthetic guild, its roles, the bot and the owner
+GUILD_ID = 900000000000000000
+MEMBER_ROLE_ID = 900000000000000001
+ADMIN_ROLE_ID = 900000000000000002
+BOT_ROLE_ID = 900000000000000003
+BOT_USER_ID = 910000000000000000
+OWNER_USER_ID = 910000000000000001
+FIRST_MEMBER_ID = 920000000000000000
+
+FAKE_TOKEN = "MT" + "x" * 70
+
+# Discord sends at most this many members per GUILD_MEMBERS_CHUNK, and per page of List Guild Members
+CHUNK_SIZE = 1000
+
+ADMINISTRATOR = 1 << 3
+KICK_AND_BAN = (1 << 1) | (1 << 2)
+# Bulk ban also needs Manage Server
+MANAGE_GUILD = 1 << 5
+
+
+def member_name(index):
+    return f"user{index}"
+
+
+def member_id(index):
+    return FIRST_MEMBER_ID + index
+
+
+def _user(user_id, name, bot=False):
+    return {"id": str(user_id), "username": name, "discriminator": "0", "global_name": None, "avatar": None, "bot": bot}
+
+
+def _member(user, roles, joined_at="2024-01-01T00:00:00+00:00"):
+    return {"user": user, "roles": [str(role) for role in roles], "joined_at": joined_at, "deaf": False, "mute": False, "flags": 0}
+
+
+def _role(role_id, name, permissions, position):
+    return {
+        "id": str(role_id), "name": name, "permissions": str(permissions), "position": position,
+        "color": 0, "hoist": False, "managed": False, "mentionable": False, "flags": 0
+    }
+
+
+def _json_response(body, status=200, headers=None):
+    # discord.py only parses bodies whose content type is exactly application/json, without a charset
+    headers = dict(headers or {}, **{"Content-Type": "application/json"})
+    return web.Response(body=json.dumps(body).encode(), status=status, headers=headers)
+
+
+class Bucket:
+    """A fixed-window rate-limit bucket, reported the way Discord does"""
+
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def take(self):
+        """Reserve one request; returns ``(allowed, headers)``"""
+        now = time.time()
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+
+        reset_after = max(self.reset_at - now, 0.0)
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Bucket": self.name,
+            "X-RateLimit-Reset": f"{self.reset_at:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if self.remaining <= 0:
+            headers["X-RateLimit-Remaining"] = "0"
+            headers["X-RateLimit-Scope"] = "user"
+            headers["Retry-After"] = f"{reset_after:.3f}"
+            # discord.py treats a 429 without Via as a Cloudflare ban instead of retrying
+            headers["Via"] = "1.1 google"
+            return False, headers
+
+        self.remaining -= 1
+        headers["X-RateLimit-Remaining"] = str(self.remaining)
+        return True, headers
+
+
+class FakeGuild:
+    """Synthetic guild: every third member has no roles, the rest have ``Member``"""
+
+    def __init__(self, members):
+        self.roles = [
+            _role(GUILD_ID, "@everyone", 0, 0),
+            _role(MEMBER_ROLE_ID, "Member", 0, 1),
+            _role(ADMIN_ROLE_ID, "Admin", ADMINISTRATOR, 2),
+            _role(BOT_ROLE_ID, "Remover", KICK_AND_BAN | MANAGE_GUILD, 3),
+        ]
+        self.bot = _member(_user(BOT_USER_ID, "remover-bot", bot=True), [BOT_ROLE_ID])
+        self.members = {
+            BOT_USER_ID: self.bot,
+            OWNER_USER_ID: _member(_user(OWNER_USER_ID, "owner"), [ADMIN_ROLE_ID]),
+        }
+        for index in range(members):
+            roles = [] if index % 3 == 0 else [MEMBER_ROLE_ID]
+            self.members[member_id(index)] = _member(_user(member_id(index), member_name(index)), roles)
+        # Ascending, for paging by ``after``; removed members are skipped when listed
+        self.member_ids = sorted(self.members)
+        self.banned = set()
+
+    def payload(self):
+        return {
+            "id": str(GUILD_ID), "name": "Fake Guild", "owner_id": str(OWNER_USER_ID),
+            "member_count": len(self.members), "large": True, "roles": self.roles, "members": [self.bot],
+            "channels": [], "threads": [], "stage_instances": [], "guild_scheduled_events": [],
+            "soundboard_sounds": [], "emojis": [], "stickers": [], "features": [], "presences": [],
+            "voice_states": [], "verification_level": 0, "default_message_notifications": 0,
+            "explicit_content_filter": 0, "mfa_level": 0, "premium_tier": 0, "system_channel_flags": 0,
+            "preferred_locale": "en-US", "afk_timeout": 300, "nsfw_level": 0
+        }
+
+    def remove(self, user_id):
+        return self.members.pop(user_id, None)
+
+    def page(self, after, limit):
+        """Up to ``limit`` members with IDs above ``after``, in ID order"""
+        page = []
+        for index in range(bisect.bisect_right(self.member_ids, after), len(self.member_ids)):
+            member = self.members.get(self.member_ids[index])
+            if member is not None:
+                page.append(member)
+                if len(page) >= limit:
+                    break
+        return page
+
+    def no_role_members(self):
+        return [user_id for user_id, member in self.members.items() if not member["roles"] and not member["user"]["bot"]]
+
+
+class _Connection:
+    """One gateway client and its event sequence number"""
+
+    def __init__(self, socket):
+        self.socket = socket
+        self.seq = 0
+
+
+class FakeDiscord:
+    """aiohttp application serving the REST routes and the gateway
+
+    ``latency`` (seconds, plus up to ``jitter``) is added to every REST
+    response. Each action route has its own bucket of ``bucket_limit``
+    requests per ``bucket_window`` seconds; requests over the limit get a
+    429 with ``Retry-After``, as Discord would answer.
+    """
+
+    def __init__(self, members=1000, latency=0.02, jitter=0.01, bucket_limit=50, bucket_window=1.0):
+        self.guild = FakeGuild(members)
+        self.latency = latency
+        self.jitter = jitter
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.buckets = {}
+        self.sockets = set()
+        self.stats = {"requests": 0, "rate_limited": 0, "kicked": 0, "banned": 0, "pruned": 0}
+        self.url = None
+
+        self.app = web.Application()
+        self.app.add_routes([
+            web.get(API_PREFIX + "/users/@me", self.get_me),
+            web.get(API_PREFIX + "/oauth2/applications/@me", self.get_application),
+            web.get(API_PREFIX + "/gateway", self.get_gateway),
+            web.get(API_PREFIX + "/gateway/bot", self.get_gateway),
+            web.get(API_PREFIX + "/guilds/{guild_id}/members", self.list_members),
+            web.delete(API_PREFIX + "/guilds/{guild_id}/members/{user_id}", self.kick),
+            web.put(API_PREFIX + "/guilds/{guild_id}/bans/{user_id}", self.ban),
+            web.post(API_PREFIX + "/guilds/{guild_id}/bulk-ban", self.bulk_ban),
+            web.get(API_PREFIX + "/guilds/{guild_id}/prune", self.estimate_prune),
+            web.post(API_PREFIX + "/guilds/{guild_id}/prune", self.prune),
+            web.get("/gateway", self.gateway),
+        ])
+
+    # REST
+
+    async def _delay(self):
+        self.stats["requests"] += 1
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def _limit(self, bucket_name, limit=None):
+        bucket = self.buckets.get(bucket_name)
+        if bucket is None:
+            bucket = self.buckets[bucket_name] = Bucket(bucket_name, limit or self.bucket_limit, self.bucket_window)
+        allowed, headers = bucket.take()
+        if allowed:
+            return None, headers
+
+        self.stats["rate_limited"] += 1
+        body = {"message": "You are being rate limited.", "retry_after": float(headers["Retry-After"]), "global": False}
+        return _json_response(body, status=429, headers=headers), headers
+
+    async def get_me(self, request):
+        await self._delay()
+        return _json_response(self.guild.bot["user"])
+
+    async def get_application(self, request):
+        await self._delay()
+        return _json_response({
+            "id": str(BOT_USER_ID), "name": "remover-bot", "description": "", "icon": None,
+            "bot_public": False, "bot_require_code_grant": False, "verify_key": "0" * 64,
+            "owner": _user(OWNER_USER_ID, "owner"), "flags": 0
+        })
+
+    async def get_gateway(self, request):
+        return _json_response({
+            "url": self.ws_url, "shards": 1,
+            "session_start_limit": {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1}
+        })
+
+    async def list_members(self, request):
+        await self._delay()
+        limited, headers = self._limit("list-members")
+        if limited:
+            return limited
+        limit = max(1, min(CHUNK_SIZE, int(request.query.get("limit", 1))))
+        return _json_response(self.guild.page(int(request.query.get("after", 0)), limit), headers=headers)
+
+    async def kick(self, request):
+        await self._delay()
+        limited, headers = self._limit("kick")
+        if limited:
+            return limited
+        user_id = int(request.match_info["user_id"])
+        if self.guild.remove(user_id) is None:
+            return _json_response({"message": "Unknown Member", "code": 10007}, status=404, headers=headers)
+        self.stats["kicked"] += 1
+        await self.dispatch("GUILD_MEMBER_REMOVE", {"guild_id": str(GUILD_ID), "user": _user(user_id, "")})
+        return web.Response(status=204, headers=headers)
+
+    async def ban(self, request):
+        await self._delay()
+        limited, headers = self._limit("ban")
+        if limited:
+            return limited
+        user_id = int(request.match_info["user_id"])
+        self.guild.remove(user_id)
+        self.guild.banned.add(user_id)
+        self.stats["banned"] += 1
+        await self.dispatch("GUILD_MEMBER_REMOVE", {"guild_id": str(GUILD_ID), "user": _user(user_id, "")})
+        return web.Response(status=204, headers=headers)
+
+    async def bulk_ban(self, request):
+        await self._delay()
+        # Bulk ban shares a much smaller bucket, as on Discord
+        limited, headers = self._limit("bulk-ban", max(1, self.bucket_limit // 10))
+        if limited:
+            return limited
+        body = await request.json()
+        banned, failed, removed = [], [], []
+        for user_id in body.get("user_ids", [])[:200]:
+            (banned if int(user_id) not in self.guild.banned else failed).append(str(user_id))
+            if self.guild.remove(int(user_id)) is not None:
+                removed.append(int(user_id))
+            self.guild.banned.add(int(user_id))
+        self.stats["banned"] += len(banned)
+        # Members leave through the gateway as with single bans, so sessions drop them
+        for user_id in removed:
+            await self.dispatch("GUILD_MEMBER_REMOVE", {"guild_id": str(GUILD_ID), "user": _user(user_id, "")})
+        return _json_response({"banned_users": banned, "failed_users": failed}, headers=headers)
+
+    async def estimate_prune(self, request):
+        await self._delay()
+        return _json_response({"pruned": len(self.guild.no_role_members())})
+
+    async def prune(self, request):
+        await self._delay()
+        limited, headers = self._limit("prune", 1)
+        if limited:
+            return limited
+        pruned = self.guild.no_role_members()
+        for user_id in pruned:
+            self.guild.remove(user_id)
+        self.stats["pruned"] += len(pruned)
+        return _json_response({"pruned": len(pruned)}, headers=headers)
+
+    # Gateway
+
+    async def gateway(self, request):
+        socket = web.WebSocketResponse(max_msg_size=0)
+        await socket.prepare(request)
+        state = _Connection(socket)
+        self.sockets.add(state)
+        try:
+            await self._send(state, {"op": 10, "d": {"heartbeat_interval": 41250}})
+            async for message in socket:
+                if message.type != WSMsgType.TEXT:
+                    break
+                await self._on_gateway_message(state, json.loads(message.data))
+        finally:
+            self.sockets.discard(state)
+        return socket
+
+    async def _send(self, state, payload):
+        if payload.get("op") == 0:
+            state.seq += 1
+            payload["s"] = state.seq
+        await state.socket.send_str(json.dumps(payload))
+
+    async def _dispatch_to(self, state, event, data):
+        await self._send(state, {"op": 0, "t": event, "d": data})
+
+    async def dispatch(self, event, data):
+        for state in list(self.sockets):
+            if not state.socket.closed:
+                await self._dispatch_to(state, event, data)
+
+    async def _on_gateway_message(self, state, message):
+        op, data = message.get("op"), message.get("d")
+        if op == 1:
+            await self._send(state, {"op": 11})
+        elif op == 2:
+            await self._dispatch_to(state, "READY", {
+                "v": 10, "user": self.guild.bot["user"], "guilds": [{"id": str(GUILD_ID), "unavailable": True}],
+                "session_id": "fake-session", "resume_gateway_url": self.ws_url, "shard": [0, 1],
+                "application": {"id": str(BOT_USER_ID), "flags": 0}
+            })
+            await self._dispatch_to(state, "GUILD_CREATE", self.guild.payload())
+        elif op == 8:
+            await self._send_member_chunks(state, data)
+
+    async def _send_member_chunks(self, state, data):
+        if data.get("user_ids"):
+            wanted = [int(user_id) for user_id in data["user_ids"]]
+            members = [self.guild.members[user_id] for user_id in wanted if user_id in self.guild.members]
+        else:
+            members = list(self.guild.members.values())
+
+        chunks = [members[start:start + CHUNK_SIZE] for start in range(0, len(members), CHUNK_SIZE)] or [[]]
+        for index, chunk in enumerate(chunks):
+            await self._dispatch_to(state, "GUILD_MEMBERS_CHUNK", {
+                "guild_id": str(GUILD_ID), "members": chunk, "chunk_index": index,
+                "chunk_count": len(chunks), "nonce": data.get("nonce"), "not_found": []
+            })
+
+    @property
+    def ws_url(self):
+        return str(yarl.URL(self.url).with_scheme("ws") / "gateway")
+
+
+def use_fake_discord(url):
+    """Point discord.py's REST base URL and default gateway at a fake server"""
+    import discord.gateway
+    import discord.http
+
+    discord.http.Route.BASE = url.rstrip("/") + API_PREFIX
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(url).with_scheme("ws") / "gateway"
+
+
+class FakeDiscordServer:
+    """Runs a ``FakeDiscord`` on a background thread, for use from synchronous code"""
+
+    def __init__(self, host="127.0.0.1", port=0, **options):
+        self.host = host
+        self.port = port
+        self.options = options
+        self.fake = None
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._runner = None
+        self.thread = threading.Thread(target=self._run, name="fake-discord", daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self._start())
+        self._started.set()
+        self.loop.run_forever()
+
+    async def _start(self):
+        self.fake = FakeDiscord(**self.options)
+        self._runner = web.AppRunner(self.fake.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.fake.url = f"http://{self.host}:{self.port}"
+
+    @property
+    def url(self):
+        return self.fake.url
+
+    def start(self):
+        self.thread.start()
+        self._started.wait()
+        logging.info(f"Fake Discord serving {len(self.fake.guild.members)} members at {self.url}")
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--bucket-limit", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = FakeDiscordServer(
+        port=args.port, members=args.members, latency=args.latency_ms / 1000, bucket_limit=args.bucket_limit
+    ).start()
+    print(f"Fake Discord at {server.url} (guild {GUILD_ID}, token {FAKE_TOKEN})")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Import-time report for the app's entry points
+
+Each entry point is imported in a fresh interpreter with ``-X importtime``.
+The report shows:
+
+* total import time
+* the heaviest top-level modules
+* which heavy third-party packages were loaded
+
+It also times the first run of the Streamlit page (``main.py``) in a cold
+interpreter, which is what a user waits for before the first page appears.
+
+    python -m benchmarks.imports
+    python -m benchmarks.imports --modules cli --top 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["main", "cli", "remover", "file_loader"]
+
+HEAVY_PACKAGES = ["streamlit", "discord", "aiohttp", "pandas", "numpy", "pyarrow", "openpyxl"]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_FIRST_PAGE = """
+import json, os, sys, time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+app = AppTest.from_file("main.py", default_timeout=120).run()
+elapsed = time.perf_counter() - started
+if app.exception:
+    raise SystemExit(app.exception[0].value)
+print(json.dumps({"first_page_s": elapsed, "loaded": [p for p in %r if p in sys.modules]}))
+""" % (HEAVY_PACKAGES,)
+
+
+def _env():
+    # A dummy token and server ID let the page render without secrets
+    return dict(
+        os.environ, DISCORD_BOT_TOKEN=os.getenv("DISCORD_BOT_TOKEN", "x"), DISCORD_GUILD_ID=os.getenv("DISCORD_GUILD_ID", "1"),
+        PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+    )
+
+
+def import_profile(module):
+    """Cumulative import times in seconds, keyed by top-level module, for a cold ``import module``"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=REPO_ROOT, env=_env(), check=True
+    )
+    profile = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Nesting shows as two spaces of indentation per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        profile[(depth, name.strip())] = int(cumulative) / 1e6
+    loaded = {name.split(".")[0] for _, name in profile}
+    total = max((seconds for (depth, name), seconds in profile.items() if name == module), default=0.0)
+    top = sorted(((seconds, name) for (depth, name), seconds in profile.items() if depth == 1), reverse=True)
+    return total, top, [package for package in HEAVY_PACKAGES if package in loaded]
+
+
+def first_page():
+    output = subprocess.run(
+        [sys.executable, "-c", _FIRST_PAGE], capture_output=True, text=True, cwd=REPO_ROOT, env=_env(), check=True
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import times of the app's entry points")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=8, help="Heaviest imports listed per module")
+    parser.add_argument("--no-first-page", action="store_true", help="Skip timing the first Streamlit page")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        total, top, loaded = import_profile(module)
+        print(f"{module}: {total:.3f}s, loads {', '.join(loaded) or 'no heavy packages'}")
+        for seconds, name in top[:args.top]:
+            print(f"    {seconds:8.3f}s  {name}")
+
+    if not args.no_first_page:
+        result = first_page()
+        print(f"first page (main.py, cold): {result['first_page_s']:.3f}s, loads {', '.join(result['loaded'])}")
+
+
+if __name__ == "__main__":
+    main()
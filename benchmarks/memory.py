@@ -0,0 +1,123 @@
+"""Memory comparison of the client profiles on a full-guild scan
+
+For each profile a fresh ``BotSession`` runs in a child process against the
+fake Discord server. The child builds the member snapshot and the no-roles
+index, which is the scan behind "Users Without Roles" and the custom
+filters, and then reports:
+
+* peak RSS
+* RSS once the scan is done (what the session keeps resident)
+* members held in discord.py's cache
+* scan time
+
+    python -m benchmarks.memory --members 100000 300000
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_discord import FAKE_TOKEN, GUILD_ID, FakeDiscordServer, use_fake_discord
+
+DEFAULT_MEMBERS = [100_000, 300_000]
+PROFILES = ["default", "lean"]
+
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def child(args):
+    """Scan the guild at ``args.url`` under ``args.profile`` and print the measurements as JSON"""
+    os.chdir(tempfile.mkdtemp(prefix="discord-memory-"))
+    use_fake_discord(args.url)
+    from bot_session import BotSession
+
+    baseline = _rss_mb()
+    session = BotSession(FAKE_TOKEN, profile=args.profile).start(timeout=120)
+
+    async def scan(client):
+        guild, snapshot = await session.member_snapshot(GUILD_ID)
+        no_roles = await session.users_without_roles(GUILD_ID)
+        return len(snapshot), len(no_roles), len(guild.members)
+
+    started = time.perf_counter()
+    members, no_roles, cached = session.run(scan, timeout=args.timeout)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    resident = _rss_mb()
+    session.close()
+
+    print(json.dumps({
+        "scan_s": round(elapsed, 3),
+        "members": members,
+        "no_roles": no_roles,
+        "cached_members": cached,
+        "start_rss_mb": round(baseline, 1),
+        "after_rss_mb": round(resident, 1),
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def run_profile(args, members, profile):
+    server = FakeDiscordServer(members=members, latency=args.latency_ms / 1000, jitter=0, bucket_limit=args.bucket_limit).start()
+    try:
+        command = [
+            sys.executable, "-m", "benchmarks.memory", "--child", "--url", server.url,
+            "--profile", profile, "--timeout", str(args.timeout)
+        ]
+        repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")])))
+        output = subprocess.run(command, capture_output=True, text=True, env=env, timeout=args.timeout, cwd=repo_root)
+        if output.returncode != 0:
+            raise RuntimeError(output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "child failed")
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+    finally:
+        server.stop()
+
+    result.update({"guild_members": members, "profile": profile})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare peak memory of the client profiles on a full-guild scan")
+    parser.add_argument("--members", type=int, nargs="+", default=DEFAULT_MEMBERS)
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=PROFILES)
+    parser.add_argument("--latency-ms", type=float, default=5)
+    parser.add_argument("--bucket-limit", type=int, default=1000, help="Requests per route per second before 429s")
+    parser.add_argument("--timeout", type=float, default=1800)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    # Internal: scan under one profile in this process
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--profile", choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    results = []
+    print(f"{'members':>8} {'profile':<8} {'cached':>8} {'scan s':>7} {'start MB':>9} {'after MB':>9} {'peak MB':>8}")
+    for members in args.members:
+        for profile in args.profiles:
+            result = run_profile(args, members, profile)
+            results.append(result)
+            print(f"{members:>8} {profile:<8} {result['cached_members']:>8} {result['scan_s']:>7} "
+                  f"{result['start_rss_mb']:>9} {result['after_rss_mb']:>9} {result['peak_rss_mb']:>8}", flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Micro-benchmarks for the CPU-bound hot paths, with stored baselines
+
+Times upload ingestion, name resolution, the no-roles scans, the filter
+engine and the "Both" list merge against synthetic guilds, and compares
+each case with ``baselines.json``. Any case slower than its baseline by
+more than the threshold is reported as a regression (exit status 1).
+
+    python -m benchmarks.micro                      # compare with baselines
+    python -m benchmarks.micro --update-baselines   # record new baselines
+    python -m benchmarks.micro --sizes 1000000 --cases resolve
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import member_name, synthetic_guild
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# Fractional slowdown over the baseline that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+# xlsx generation is slow, so large sheets are only written as CSV
+MAX_XLSX_ROWS = 100_000
+
+
+def _write_csv(path, size):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Discord Username\n")
+        for index in range(size):
+            f.write(member_name(index) + "\n")
+
+
+def _write_xlsx(path, size):
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Discord Username"])
+    for index in range(size):
+        sheet.append([member_name(index)])
+    workbook.save(path)
+
+
+def cases(size, workdir):
+    """Yield ``(name, setup)`` pairs; ``setup()`` returns the callable to time"""
+    guild_cache = {}
+
+    def guild():
+        if "guild" not in guild_cache:
+            guild_cache["guild"] = synthetic_guild(size)
+        return guild_cache["guild"]
+
+    def snapshot():
+        if "snapshot" not in guild_cache:
+            from member_snapshot import build_member_snapshot
+            guild_cache["snapshot"] = build_member_snapshot(guild())
+        return guild_cache["snapshot"]
+
+    def ingest(extension, writer):
+        def setup():
+            from file_loader import process_excel_file
+            path = os.path.join(workdir, f"upload_{size}.{extension}")
+            if not os.path.exists(path):
+                writer(path, size)
+            def run():
+                entries, message = process_excel_file(path)
+                if entries is None:
+                    raise RuntimeError(message)
+            return run
+        return setup
+
+    def snapshot_build():
+        from member_snapshot import build_member_snapshot
+        members = guild()
+        return lambda: build_member_snapshot(members)
+
+    def resolve():
+        from member_snapshot import plan_targets
+        # One upload naming a tenth of the guild, plus names that match nobody
+        entries = [member_name(index) for index in range(0, size, 10)] + [f"missing{i}" for i in range(size // 100)]
+        members = snapshot()
+        return lambda: plan_targets(members, entries, bot_user_id=0)
+
+    def no_roles_scan():
+        from role_index import NoRoleIndex
+        members = guild()
+        return lambda: NoRoleIndex().rebuild_from_members(members)
+
+    def no_roles_snapshot():
+        from member_filters import users_without_roles
+        members = snapshot()
+        return lambda: users_without_roles(members)
+
+    def filter_engine():
+        from member_filters import All, JoinedBefore, LacksRoles, select_members
+        from benchmarks.synthetic import FIRST_ROLE_ID
+        members = snapshot()
+        predicate = All(JoinedBefore(30), LacksRoles([FIRST_ROLE_ID, FIRST_ROLE_ID + 1, FIRST_ROLE_ID + 2]))
+        return lambda: select_members(members, predicate, bot_user_id=0)
+
+    def both_merge():
+        from safety import merge_targets
+        # Half of the no-role list is also in the upload
+        upload = [member_name(index) for index in range(size)]
+        no_roles = [member_name(index) for index in range(0, size * 2, 3)]
+        return lambda: merge_targets(upload, no_roles)
+
+    yield f"ingest_csv_{size}", ingest("csv", _write_csv)
+    if size <= MAX_XLSX_ROWS:
+        yield f"ingest_xlsx_{size}", ingest("xlsx", _write_xlsx)
+    yield f"snapshot_build_{size}", snapshot_build
+    yield f"resolve_{size}", resolve
+    yield f"no_roles_scan_{size}", no_roles_scan
+    yield f"no_roles_snapshot_{size}", no_roles_snapshot
+    yield f"filter_{size}", filter_engine
+    yield f"both_merge_{size}", both_merge
+
+
+def measure(function, repeat):
+    """Median wall time of ``repeat`` runs, after one warm-up run"""
+    function()
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for matching, filtering and ingestion")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--cases", nargs="+", help="Only run cases whose name starts with one of these")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args()
+
+    baselines = load_baselines(args.baselines)
+    results = {}
+    regressions = []
+
+    print(f"{'case':<28} {'seconds':>10} {'baseline':>10} {'change':>8}")
+    with tempfile.TemporaryDirectory(prefix="discord-micro-") as workdir:
+        for size in args.sizes:
+            for name, setup in cases(size, workdir):
+                if args.cases and not name.startswith(tuple(args.cases)):
+                    continue
+                seconds = measure(setup(), args.repeat)
+                results[name] = round(seconds, 6)
+
+                baseline = baselines.get(name)
+                change = ""
+                if baseline:
+                    ratio = seconds / baseline - 1
+                    change = f"{ratio:+.0%}"
+                    if ratio > args.threshold:
+                        regressions.append(name)
+                        change += " !"
+                print(f"{name:<28} {seconds:>10.4f} {baseline or '-':>10} {change:>8}", flush=True)
+
+    if args.update_baselines:
+        baselines.update(results)
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"Updated {len(results)} baselines in {args.baselines}")
+        return
+
+    if regressions:
+        print(f"Regressions over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+
+import discord
+
+from action_executor import RateLimitTracker
+from member_store import SNAPSHOT_MAX_AGE, MemberStore
+from role_index import NoRoleIndex
+
+# "default" caches every member in memory; "lean" keeps member lists only
+# in the member store, for guilds too large to hold as discord.py objects
+CLIENT_PROFILE = os.getenv("DISCORD_CLIENT_PROFILE", "default")
+CLIENT_PROFILES = ["default", "lean"]
+
+# Members fetched per page (and written per transaction) by a lean refresh
+REFRESH_PAGE_SIZE = 1000
+
+# One session per bot token, shared by every caller in the process
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def client_options(profile=CLIENT_PROFILE):
+    """Keyword arguments for ``discord.Client`` under a client profile
+
+    The lean profile subscribes only to guild and member events and caches
+    no members or messages. Both enable raw socket events, so member updates
+    reach the store even for members that are not cached.
+    """
+    if profile == "default":
+        intents = discord.Intents.default()
+        intents.members = True
+        intents.guilds = True
+        return {"intents": intents, "enable_debug_events": True}
+    if profile == "lean":
+        intents = discord.Intents.none()
+        intents.guilds = True
+        intents.members = True
+        return {
+            "intents": intents,
+            "member_cache_flags": discord.MemberCacheFlags.none(),
+            "max_messages": None,
+            "enable_debug_events": True,
+        }
+    raise ValueError(f"Unknown client profile {profile!r}, expected one of {', '.join(CLIENT_PROFILES)}")
+
+
+class PayloadMember:
+    """The member fields the store and no-roles index need, read from a raw gateway payload
+
+    discord.py only dispatches ``member_update`` for members it had cached,
+    so a session working from a stored snapshot, or under the lean profile,
+    would miss role changes; sessions build these from the raw event instead.
+    """
+
+    __slots__ = ("guild", "id", "name", "discriminator", "global_name", "display_name", "roles", "bot", "joined_at", "pending")
+
+    def __init__(self, guild, data):
+        user = data["user"]
+        self.guild = guild
+        self.id = int(user["id"])
+        self.name = user["username"]
+        self.discriminator = user.get("discriminator", "0")
+        self.global_name = user.get("global_name")
+        self.display_name = data.get("nick") or self.global_name or self.name
+        self.roles = [discord.Object(id=int(role_id)) for role_id in data.get("roles", [])]
+        self.bot = user.get("bot", False)
+        self.joined_at = discord.utils.parse_time(data.get("joined_at"))
+        self.pending = data.get("pending", False)
+
+
+class BotSession:
+    """Long-lived Discord client running on its own event loop thread
+
+    Login, the gateway handshake and member chunking are paid once; every
+    caller then reuses the warm client and member cache through ``run``.
+    Guilds are chunked lazily, so ID-only work never waits for the member list.
+    Member lists are also persisted to a ``MemberStore`` that member events
+    keep current, so a restarted session can skip chunking entirely; changes
+    made while no session was connected are not in it, so removals re-check
+    their targets until the session has refreshed the guild itself. A
+    ``NoRoleIndex`` follows the same events to answer role-less lookups live.
+
+    Under the lean ``profile`` no member is ever cached: member lists are
+    paged over HTTP straight into the store, which is then the only copy.
+    """
+
+    def __init__(self, token, store=None, profile=CLIENT_PROFILE):
+        if profile not in CLIENT_PROFILES:
+            raise ValueError(f"Unknown client profile {profile!r}, expected one of {', '.join(CLIENT_PROFILES)}")
+        self.token = token
+        self.profile = profile
+        self.lean = profile == "lean"
+        self.rate_limits = RateLimitTracker()
+        self.store = store or MemberStore()
+        self.no_roles = NoRoleIndex()
+        # Guilds whose member list this session loaded itself; events keep those current
+        self.refreshed = set()
+        self.client = None
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name="discord-bot-session", daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._main())
+        except Exception as e:
+            self.error = e
+            logging.error(f"Bot session error: {str(e)}")
+        finally:
+            self.ready.set()
+            self.loop.close()
+
+    async def _main(self):
+        self.client = discord.Client(
+            **client_options(self.profile),
+            http_trace=self.rate_limits.trace_config(),
+            chunk_guilds_at_startup=False
+        )
+
+        @self.client.event
+        async def on_ready():
+            logging.info(f"Bot session connected as {self.client.user}")
+            self.ready.set()
+
+        # Keep the stored member snapshots and the no-roles index current
+        @self.client.event
+        async def on_member_join(member):
+            self.store.upsert_member(member)
+            self.no_roles.apply_member(member)
+
+        # Member updates are read from the raw event: discord.py drops them
+        # silently for members missing from its cache, e.g. after a restart
+        # that reused the stored snapshot instead of chunking
+        @self.client.event
+        async def on_socket_raw_receive(message):
+            # Cheap substring test first: this sees every gateway frame
+            if not isinstance(message, str) or "GUILD_MEMBER_UPDATE" not in message:
+                return
+            payload = json.loads(message)
+            if payload.get("t") != "GUILD_MEMBER_UPDATE":
+                return
+            guild = self.client.get_guild(int(payload["d"]["guild_id"]))
+            if guild is not None:
+                member = PayloadMember(guild, payload["d"])
+                self.store.upsert_member(member)
+                self.no_roles.apply_member(member)
+
+        @self.client.event
+        async def on_raw_member_remove(payload):
+            self.store.remove_member(payload.guild_id, payload.user.id)
+            self.no_roles.remove_member(payload.guild_id, payload.user.id)
+
+        @self.client.event
+        async def on_user_update(before, after):
+            self.store.update_user(after)
+            self.no_roles.rename_user(after)
+
+        # Deleted roles can leave members role-less without a member event
+        @self.client.event
+        async def on_guild_role_delete(role):
+            await self._rebuild_no_roles(role.guild)
+
+        @self.client.event
+        async def on_guild_role_update(before, after):
+            if self.no_roles.needs_rebuild(after.guild):
+                await self._rebuild_no_roles(after.guild)
+
+        @self.client.event
+        async def on_guild_update(before, after):
+            if self.no_roles.needs_rebuild(after):
+                await self._rebuild_no_roles(after)
+
+        try:
+            await self.client.start(self.token)
+        finally:
+            # Also waits for a close() started from another thread to finish
+            await self.client.close()
+
+    def start(self, timeout=30):
+        """Start the client thread and wait until the gateway is ready"""
+        self.thread.start()
+        if not self.ready.wait(timeout):
+            raise TimeoutError(f"Discord did not respond within {timeout} seconds")
+        if self.error:
+            raise self.error
+        return self
+
+    def is_alive(self):
+        return self.thread.is_alive() and self.client is not None and not self.client.is_closed()
+
+    def submit(self, operation):
+        """Schedule ``operation(client)`` on the session loop and return a concurrent future"""
+        return asyncio.run_coroutine_threadsafe(operation(self.client), self.loop)
+
+    def run(self, operation, timeout=None):
+        """Run ``operation(client)`` on the session loop and wait for its result"""
+        return self.submit(operation).result(timeout)
+
+    async def get_guild(self, guild_id):
+        """Return the guild without loading its member list
+
+        Work that needs members goes through ``member_snapshot``.
+        """
+        return self.client.get_guild(int(guild_id))
+
+    async def _refresh_members(self, guild):
+        """Reload the guild's full member list into the store"""
+        logging.info(f"Refreshing members of guild {guild.id} ({self.profile} profile)")
+        with self.rate_limits.metrics.timed("chunking"):
+            if not self.lean:
+                await guild.chunk()
+                self.store.replace_guild(guild)
+                self.refreshed.add(guild.id)
+                return
+
+            # Page by page, so at most one page of members is alive at a time
+            self.store.begin_refresh(guild.id)
+            page = []
+            async for member in guild.fetch_members(limit=None):
+                page.append(member)
+                if len(page) >= REFRESH_PAGE_SIZE:
+                    self.store.stage_members(page)
+                    page = []
+            self.store.stage_members(page)
+            self.store.finish_refresh(guild.id)
+            self.refreshed.add(guild.id)
+
+    def is_verified(self, guild_id):
+        """Whether the stored members of the guild were loaded by this session
+
+        A snapshot stored by an earlier session may predate changes made
+        while nothing was listening for member events.
+        """
+        return int(guild_id) in self.refreshed
+
+    async def member_snapshot(self, guild_id, max_age=SNAPSHOT_MAX_AGE, force_refresh=False):
+        """Return ``(guild, snapshot)`` from the member store
+
+        The guild is only re-chunked when the stored snapshot is missing,
+        older than ``max_age`` seconds, or ``force_refresh`` is set.
+        """
+        guild = self.client.get_guild(int(guild_id))
+        if guild is None:
+            return None, None
+
+        if force_refresh or not self.store.is_fresh(guild.id, max_age):
+            await self._refresh_members(guild)
+        snapshot = await asyncio.to_thread(self.store.load_snapshot, guild)
+        if force_refresh or not self.no_roles.is_built(guild.id):
+            self.no_roles.rebuild(guild, snapshot)
+        return guild, snapshot
+
+    async def _rebuild_no_roles(self, guild):
+        if self.no_roles.is_built(guild.id):
+            snapshot = await asyncio.to_thread(self.store.load_snapshot, guild)
+            self.no_roles.rebuild(guild, snapshot)
+
+    async def users_without_roles(self, guild_id):
+        """Return the names of role-less, non-protected members from the live index
+
+        The index is built from the member snapshot on first use; afterwards
+        the lookup never scans the member list.
+        """
+        guild_id = int(guild_id)
+        if not self.no_roles.is_built(guild_id):
+            guild, _ = await self.member_snapshot(guild_id)
+            if guild is None:
+                return []
+        return self.no_roles.names(guild_id)
+
+    def close(self, timeout=10):
+        if self.is_alive():
+            # start() returns as soon as closing begins, so wait for the loop thread instead
+            asyncio.run_coroutine_threadsafe(self.client.close(), self.loop)
+            self.thread.join(timeout)
+
+
+def get_session(token, timeout=30):
+    """Return the process-wide session for ``token``, starting it on first use"""
+    with _sessions_lock:
+        session = _sessions.get(token)
+        if session is None or not session.is_alive():
+            session = BotSession(token).start(timeout)
+            _sessions[token] = session
+        return session
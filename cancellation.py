@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+
+class CancellationToken:
+    """Thread-safe cancel flag shared between the UI and a running job
+
+    Any thread may call ``cancel``; callbacks registered with
+    ``add_callback`` run once, on the cancelling thread, so event loops can
+    be woken with ``call_soon_threadsafe``.
+    """
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """Call ``callback()`` on cancellation, immediately if already cancelled"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def future(self, loop):
+        """Future on ``loop`` resolved when the token is cancelled, and its callback for removal"""
+        future = loop.create_future()
+
+        def resolve():
+            if not future.done():
+                future.set_result(None)
+
+        def callback():
+            loop.call_soon_threadsafe(resolve)
+
+        self.add_callback(callback)
+        return future, callback
+
+
+async def unless_cancelled(awaitable, cancelled):
+    """Await ``awaitable`` unless the ``cancelled`` future resolves first
+
+    Returns ``True`` if the awaitable completed and ``False`` if it was
+    abandoned because of cancellation.
+    """
+    if cancelled.done():
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        return False
+
+    task = asyncio.ensure_future(awaitable)
+    await asyncio.wait({task, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+    if task.done():
+        task.result()
+        return True
+
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return False
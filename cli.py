@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Discord User Remover Bot - Headless Command
+Batch removals for cron jobs and scripts, without the Streamlit UI
+
+Every outcome is written to stdout as one JSON object per line, followed by
+a summary line; logs go to stderr. The bot token is read from
+DISCORD_BOT_TOKEN (environment or .env).
+
+    python cli.py --file users.csv --action kick --dry-run
+    python cli.py --filter custom --joined-before 90 --lacks-roles Verified --action kick
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from action_executor import DEFAULT_MAX_IN_FLIGHT
+from file_loader import process_excel_file
+from member_filters import (
+    All, Any, AccountYoungerThan, HasNoRoles, JoinedBefore, LacksRoles, PendingScreening, resolve_roles, select_members,
+    split_role_names
+)
+from member_snapshot import build_member_snapshot
+from remover import DiscordUserRemover
+from safety import merge_targets
+
+FILTERS = ["file", "no-roles", "both", "custom"]
+
+
+def emit(record):
+    """Write one JSON line to stdout immediately"""
+    print(json.dumps(record, default=str), flush=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Kick or ban Discord users in batch, writing JSON-lines results to stdout")
+    parser.add_argument("--file", help="Excel, CSV, TSV or Parquet file of usernames or user IDs")
+    parser.add_argument("--filter", choices=FILTERS, help="Which users to act on (default: file)")
+    parser.add_argument("--action", choices=["kick", "ban"], default="kick")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_MAX_IN_FLIGHT, help="Maximum concurrent kick/ban requests")
+    parser.add_argument("--no-bulk-ban", action="store_true", help="Ban users one request at a time (also the fallback without Manage Server)")
+    parser.add_argument("--dry-run", action="store_true", help="Resolve and safety-check users without acting on them")
+    parser.add_argument("--guild-id", default=os.getenv("DISCORD_GUILD_ID"), help="Server ID (default: DISCORD_GUILD_ID)")
+    parser.add_argument("--connect-timeout", type=float, default=60, help="Seconds to wait for login")
+    parser.add_argument("--verbose", action="store_true", help="Log progress to stderr")
+
+    custom = parser.add_argument_group("custom filter")
+    custom.add_argument("--joined-before", type=int, metavar="DAYS", help="Joined more than DAYS days ago")
+    custom.add_argument("--lacks-roles", metavar="NAMES", help="Has none of these roles (comma separated names or IDs)")
+    custom.add_argument("--no-roles", action="store_true", help="Has no roles at all")
+    custom.add_argument("--account-younger-than", type=int, metavar="DAYS", help="Account created within DAYS days")
+    custom.add_argument("--pending", action="store_true", help="Pending membership screening")
+    custom.add_argument("--match", choices=["all", "any"], default="all", help="Combine the conditions with AND or OR")
+
+    args = parser.parse_args(argv)
+    args.filter = args.filter or "file"
+    if args.filter in ["file", "both"] and not args.file:
+        parser.error(f"--filter {args.filter} requires --file")
+    if args.lacks_roles is not None and not split_role_names(args.lacks_roles):
+        parser.error("--lacks-roles requires at least one role name or ID")
+    custom_conditions = [args.joined_before, args.lacks_roles, args.no_roles, args.account_younger_than, args.pending]
+    if args.filter == "custom" and not any(custom_conditions):
+        parser.error("--filter custom requires at least one custom filter condition")
+    if not args.guild_id:
+        parser.error("--guild-id or DISCORD_GUILD_ID is required")
+    return args
+
+
+def custom_predicates(args, guild):
+    """Conditions selected by the custom filter flags; role names resolve against ``guild``"""
+    predicates = []
+    if args.joined_before:
+        predicates.append(JoinedBefore(args.joined_before))
+    if args.lacks_roles:
+        predicates.append(LacksRoles(resolve_roles(guild, split_role_names(args.lacks_roles))))
+    if args.no_roles:
+        predicates.append(HasNoRoles())
+    if args.account_younger_than:
+        predicates.append(AccountYoungerThan(args.account_younger_than))
+    if args.pending:
+        predicates.append(PendingScreening())
+    return predicates
+
+
+async def select_targets(remover, args):
+    """Entries to act on, from the file and/or the member list, without duplicates"""
+    lists = []
+    if args.filter in ["file", "both"]:
+        entries, message = process_excel_file(args.file)
+        if entries is None:
+            raise ValueError(message)
+        logging.info(message)
+        lists.append(entries)
+    if args.filter in ["no-roles", "both"]:
+        lists.append(await remover.get_users_without_roles(args.guild_id))
+    if args.filter == "custom":
+        guild = remover.bot.get_guild(int(args.guild_id))
+        await remover.load_members(guild)
+        predicates = custom_predicates(args, guild)
+        predicate = All(*predicates) if args.match == "all" else Any(*predicates)
+        matched = select_members(build_member_snapshot(guild), predicate, remover.bot.user.id)
+        logging.info(f"{len(matched)} users match {predicate}")
+        # Matched members are acted on by ID, so names never need resolving
+        lists.append(matched["id"].tolist())
+    return merge_targets(*lists)
+
+
+async def dry_run(remover, guild, entries):
+    """Resolve and safety-check entries, reporting what would happen"""
+    targets, rejected = await remover.resolve_targets(guild, entries)
+    for entry, user_id, reason in rejected:
+        emit({"type": "result", "entry": entry, "user_id": user_id, "outcome": "failed", "error": reason})
+    for entry, member in targets:
+        emit({"type": "result", "entry": entry, "user_id": member.id, "name": member.name, "outcome": "planned", "error": None})
+    return len(targets), len(rejected)
+
+
+async def run(args):
+    token = os.getenv("DISCORD_BOT_TOKEN")
+    if not token:
+        raise ValueError("DISCORD_BOT_TOKEN is not set")
+
+    remover = DiscordUserRemover(max_in_flight=args.concurrency)
+    if not await remover.create_bot(token, args.guild_id, timeout=args.connect_timeout):
+        raise ConnectionError("Could not connect to Discord")
+
+    try:
+        guild = remover.bot.get_guild(int(args.guild_id))
+        if not guild:
+            raise ValueError(f"Guild {args.guild_id} not found")
+
+        entries = await select_targets(remover, args)
+        started = time.perf_counter()
+        summary = {"type": "summary", "action": args.action, "dry_run": args.dry_run, "selected": len(entries)}
+
+        if args.dry_run:
+            planned, failed = await dry_run(remover, guild, entries)
+            summary.update(planned=planned, failed=failed)
+        else:
+            def on_result(result):
+                emit({
+                    "type": "result",
+                    "entry": result.entry,
+                    "user_id": result.user_id,
+                    "outcome": "removed" if result.ok else "failed",
+                    "error": result.error,
+                    "code": result.code,
+                    "status": result.status,
+                    "latency_ms": round(result.latency * 1000, 1) if result.latency is not None else None
+                })
+
+            success, message = await remover.remove_users(
+                entries, args.guild_id, args.action, bulk_ban=not args.no_bulk_ban, on_result=on_result
+            )
+            if not success:
+                raise RuntimeError(message)
+            metrics = remover.run_metrics
+            summary.update(
+                removed=remover.results.removed,
+                failed=remover.results.failed,
+                users_per_second=round(metrics.users_per_second, 2),
+                rate_limited=metrics.rate_limited,
+                retried=metrics.retried
+            )
+
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        emit(summary)
+    finally:
+        await remover.disconnect()
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        stream=sys.stderr
+    )
+
+    try:
+        asyncio.run(run(args))
+    except Exception as e:
+        emit({"type": "error", "error": str(e)})
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
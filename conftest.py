@@ -0,0 +1 @@
+# Lets pytest import the top-level modules and benchmarks package from tests/
@@ -0,0 +1,300 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from safety import is_snowflake
+
+# Entries yielded per chunk when streaming a sheet
+DEFAULT_CHUNK_SIZE = 10000
+
+# Only Discord user ID columns; other IDs (customer, guild, order...) are not targets
+_ID_COLUMN = re.compile(r'(discord|user)[ _-]?id\b')
+
+# Upload formats, by file extension
+SUPPORTED_EXTENSIONS = ['xlsx', 'xls', 'csv', 'tsv', 'parquet']
+
+# Bounds for the process-wide parsed upload cache
+CACHE_MAX_UPLOADS = 8
+CACHE_MAX_ENTRIES = 2_000_000
+
+
+def detect_target_column(columns):
+    """Find the column holding targets, preferring user IDs over usernames
+
+    Returns ``(column, kind)`` with kind ``"id"`` or ``"username"``, or ``(None, None)``.
+    """
+    # A user ID column (e.g. "User ID", "discord_id") needs no member lookup
+    for col in columns:
+        if col is not None and _ID_COLUMN.search(str(col).lower()):
+            return col, "id"
+
+    # Look for username column (case insensitive)
+    for col in columns:
+        if col is not None and ('username' in str(col).lower() or 'discord' in str(col).lower()):
+            return col, "username"
+
+    return None, None
+
+
+class ColumnStream:
+    """Iterates the cleaned values of one sheet column in chunks
+
+    Usernames are yielded as stripped strings and user IDs as ints; empty
+    cells are dropped and invalid IDs are counted in ``skipped``.
+    """
+
+    def __init__(self, column, kind, values, chunk_size=DEFAULT_CHUNK_SIZE, on_close=None):
+        self.column = column
+        self.kind = kind
+        self.count = 0
+        self.skipped = 0
+        self._values = values
+        self._chunk_size = chunk_size
+        self._on_close = on_close
+
+    def __iter__(self):
+        chunk = []
+        try:
+            for value in self._values:
+                entry = self._clean(value)
+                if entry is None:
+                    continue
+                chunk.append(entry)
+                if len(chunk) >= self._chunk_size:
+                    self.count += len(chunk)
+                    yield chunk
+                    chunk = []
+            if chunk:
+                self.count += len(chunk)
+                yield chunk
+        finally:
+            self.close()
+
+    def _clean(self, value):
+        if value is None or (isinstance(value, float) and value != value):
+            return None
+
+        if self.kind == "id":
+            if isinstance(value, float):
+                raise ValueError(f"Column '{self.column}' holds IDs as numbers, which loses precision. Please format the column as text")
+            value = str(value).strip()
+            if not value:
+                return None
+            if not is_snowflake(value):
+                self.skipped += 1
+                return None
+            return int(value)
+
+        value = str(value).strip()
+        return value or None
+
+    def close(self):
+        if self._on_close:
+            self._on_close()
+            self._on_close = None
+
+    def summary(self):
+        noun = "user IDs" if self.kind == "id" else "usernames"
+        message = f"Found {self.count} {noun} in column '{self.column}'"
+        if self.skipped:
+            message += f" (skipped {self.skipped} invalid values)"
+        return message
+
+
+def _missing_column_error():
+    return ValueError("No username column found. Please ensure your file has a column containing 'username', 'discord' or a user ID")
+
+
+def stream_excel_column(uploaded_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the target column of an xlsx file without loading the whole workbook
+
+    The sheet is read row by row in openpyxl read-only mode, so memory stays
+    flat regardless of sheet size.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        column, kind = detect_target_column(header)
+        if column is None:
+            raise _missing_column_error()
+    except Exception:
+        workbook.close()
+        raise
+
+    index = list(header).index(column)
+    values = (row[index] if index < len(row) else None for row in rows)
+    return ColumnStream(column, kind, values, chunk_size, on_close=workbook.close)
+
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+
+def stream_legacy_excel_column(uploaded_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the target column of a legacy .xls file, which openpyxl cannot read"""
+    import pandas as pd
+
+    header = pd.read_excel(uploaded_file, nrows=0).columns
+    column, kind = detect_target_column(header)
+    if column is None:
+        raise _missing_column_error()
+
+    _rewind(uploaded_file)
+    # Read the column as text so IDs keep their digits
+    df = pd.read_excel(uploaded_file, usecols=[column], dtype=str if kind == "id" else None)
+    return ColumnStream(column, kind, df[column].tolist(), chunk_size)
+
+
+def stream_delimited_column(uploaded_file, sep=",", chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the target column of a CSV/TSV file, parsing only that column"""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    header = pd.read_csv(uploaded_file, sep=sep, nrows=0).columns
+    column, kind = detect_target_column(header)
+    if column is None:
+        raise _missing_column_error()
+
+    _rewind(uploaded_file)
+    # Arrow's streaming CSV reader converts only the projected column, as text so IDs keep their digits
+    reader = pa_csv.open_csv(
+        uploaded_file,
+        parse_options=pa_csv.ParseOptions(delimiter=sep),
+        convert_options=pa_csv.ConvertOptions(include_columns=[column], column_types={column: pa.string()})
+    )
+    values = (value for batch in reader for value in batch.column(0).to_pylist())
+    return ColumnStream(column, kind, values, chunk_size, on_close=reader.close)
+
+
+def stream_parquet_column(uploaded_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream the target column of a Parquet file, reading only that column's pages"""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(uploaded_file)
+    column, kind = detect_target_column(parquet_file.schema_arrow.names)
+    if column is None:
+        raise _missing_column_error()
+
+    batches = parquet_file.iter_batches(batch_size=chunk_size, columns=[column])
+    values = (value for batch in batches for value in batch.column(0).to_pylist())
+    return ColumnStream(column, kind, values, chunk_size, on_close=parquet_file.close)
+
+
+def _file_format(source):
+    return os.path.splitext(_file_name(source))[1].lower().lstrip(".")
+
+
+def _file_name(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return getattr(source, "name", "") or ""
+
+
+def stream_target_column(uploaded_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Open an uploaded file and return a ``ColumnStream`` over its target column
+
+    The reader is chosen from the file extension; every format shares the
+    same column detection and value cleaning.
+    """
+    extension = _file_format(uploaded_file)
+    if extension == "csv":
+        return stream_delimited_column(uploaded_file, ",", chunk_size)
+    if extension == "tsv":
+        return stream_delimited_column(uploaded_file, "\t", chunk_size)
+    if extension == "parquet":
+        return stream_parquet_column(uploaded_file, chunk_size)
+    if extension == "xls":
+        return stream_legacy_excel_column(uploaded_file, chunk_size)
+    return stream_excel_column(uploaded_file, chunk_size)
+
+
+def _parse_upload(uploaded_file):
+    stream = stream_target_column(uploaded_file)
+    entries = [entry for chunk in stream for entry in chunk]
+    return stream.column, entries, stream.summary()
+
+
+def process_excel_file(uploaded_file, cache=None):
+    """Process an uploaded Excel, CSV, TSV or Parquet file and extract usernames,
+    or integer user IDs if the file has an ID column
+
+    With a ``ParsedUploadCache``, a file already parsed is served from the cache.
+    """
+    try:
+        if cache is not None:
+            return cache.get_or_parse(uploaded_file)
+        _, entries, message = _parse_upload(uploaded_file)
+        return entries, message
+
+    except ValueError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"Error processing file: {str(e)}"
+
+
+class ParsedUploadCache:
+    """Bounded LRU cache of parsed uploads, keyed by content hash and format
+
+    Streamlit reruns the script on every widget change; identical uploads
+    are parsed once per process and served from here afterwards. Eviction
+    keeps at most ``max_uploads`` files and ``max_entries`` parsed values.
+    """
+
+    def __init__(self, max_uploads=CACHE_MAX_UPLOADS, max_entries=CACHE_MAX_ENTRIES):
+        self.max_uploads = max_uploads
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._total_entries = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(uploaded_file):
+        digest = hashlib.sha256()
+        if isinstance(uploaded_file, (str, os.PathLike)):
+            with open(uploaded_file, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            uploaded_file.seek(0)
+            for block in iter(lambda: uploaded_file.read(1 << 20), b""):
+                digest.update(block)
+            uploaded_file.seek(0)
+        return digest.hexdigest()
+
+    def get_or_parse(self, uploaded_file):
+        """Return ``(entries, message)`` for an upload, parsing it only on a cache miss"""
+        key = (self._digest(uploaded_file), _file_format(uploaded_file))
+
+        with self._lock:
+            cached = self._items.get(key)
+            if cached is not None:
+                self._items.move_to_end(key)
+                column, entries, message = cached
+                return list(entries), message
+
+        column, entries, message = _parse_upload(uploaded_file)
+
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = (column, tuple(entries), message)
+                self._total_entries += len(entries)
+                while self._items and (len(self._items) > self.max_uploads or self._total_entries > self.max_entries):
+                    _, (_, evicted, _) = self._items.popitem(last=False)
+                    self._total_entries -= len(evicted)
+        return entries, message
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._total_entries = 0
+
+
+# Shared by every Streamlit session in the process
+upload_cache = ParsedUploadCache()
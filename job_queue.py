@@ -0,0 +1,161 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from cancellation import CancellationToken
+from progress import ProgressChannel
+from results import ResultLog
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+# Finished jobs kept for status/result lookups before the oldest are dropped
+MAX_FINISHED_JOBS = 50
+
+
+class Job:
+    """One queued removal run and its live results"""
+
+    def __init__(self, job_id, entries, options):
+        self.id = job_id
+        self.entries = list(entries)
+        self.options = dict(options)
+        self.status = QUEUED
+        self.error = None
+        self.results = ResultLog()
+        self.metrics = None
+        self.cancel_token = CancellationToken()
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.progress = ProgressChannel(len(self.entries))
+        self._done = threading.Event()
+
+    @property
+    def total(self):
+        return len(self.entries)
+
+    @property
+    def processed(self):
+        return self.results.processed
+
+    @property
+    def cancel_requested(self):
+        return self.cancel_token.cancelled
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+
+class JobQueue:
+    """Runs removal jobs one at a time on a dedicated worker thread
+
+    ``runner(job)`` does the work synchronously, appends to ``job.results``
+    and publishes to ``job.progress`` as it goes; callers only
+    submit, watch, cancel and collect.
+    """
+
+    def __init__(self, runner):
+        self.runner = runner
+        self._jobs = OrderedDict()
+        self._pending = queue.Queue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._work, name="removal-job-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, entries, **options):
+        """Queue a run and return its job ID"""
+        with self._lock:
+            job = Job(next(self._ids), entries, options)
+            self._jobs[job.id] = job
+        self._pending.put(job)
+        logging.info(f"Queued job {job.id} with {job.total} users")
+        return job.id
+
+    def status(self, job_id):
+        """Return the job, or None if it is unknown or has been dropped"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running one to stop"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+        # Outside the lock: the token wakes the running job's event loop
+        job.cancel_token.cancel()
+        logging.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def result(self, job_id, timeout=None):
+        """Wait for a job to finish and return it"""
+        job = self.status(job_id)
+        if job is None:
+            raise KeyError(f"Unknown job {job_id}")
+        if not job.wait(timeout):
+            raise TimeoutError(f"Job {job_id} did not finish within {timeout} seconds")
+        return job
+
+    def _work(self):
+        while True:
+            job = self._pending.get()
+            with self._lock:
+                if job.finished:
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+
+            try:
+                self.runner(job)
+                state = CANCELLED if job.cancel_requested else COMPLETED
+            except Exception as e:
+                job.error = str(e)
+                state = FAILED
+                logging.error(f"Job {job.id} failed: {str(e)}")
+
+            with self._lock:
+                self._finish(job, state)
+            logging.info(f"Job {job.id} {state}: removed {job.results.removed}, failed {job.results.failed}, "
+                         f"not attempted {job.results.not_attempted}")
+
+    def _finish(self, job, state):
+        job.status = state
+        job.finished_at = time.time()
+        job._done.set()
+        job.progress.close(state)
+
+        finished = [j for j in self._jobs.values() if j.finished]
+        for old in finished[:-MAX_FINISHED_JOBS]:
+            del self._jobs[old.id]
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(name, runner):
+    """Return the process-wide queue called ``name``, creating it with ``runner`` on first use"""
+    with _queues_lock:
+        if name not in _queues:
+            _queues[name] = JobQueue(runner)
+        return _queues[name]
@@ -1,13 +1,18 @@
 import streamlit as st
-import pandas as pd
-import asyncio
-import discord
-from discord.ext import commands
 import os
 from dotenv import load_dotenv
 import logging
 from datetime import datetime
-import time
+
+# discord.py, pandas and openpyxl are imported by the features that use them,
+# so the first page renders without loading them
+from action_executor import DEFAULT_MAX_IN_FLIGHT
+from file_loader import SUPPORTED_EXTENSIONS, process_excel_file, upload_cache
+from job_queue import CANCELLED, COMPLETED, FAILED, QUEUED, RUNNING, get_job_queue
+from metrics import process_metrics, start_metrics_server
+from results import Outcome, ResultLog
+from run_journal import JournalSummary, RunJournal, list_journals
+from safety import merge_targets
 
 # Load environment variables
 load_dotenv()
@@ -22,170 +27,110 @@ logging.basicConfig(
     ]
 )
 
-class DiscordUserRemover:
-    def __init__(self):
-        self.bot = None
-        self.is_connected = False
-        self.removed_users = []
-        self.failed_users = []
-        
-    async def create_bot(self, token, guild_id):
-        """Create and connect Discord bot"""
-        try:
-            intents = discord.Intents.default()
-            intents.members = True
-            intents.guilds = True
-            
-            self.bot = commands.Bot(command_prefix='!', intents=intents)
-            
-            @self.bot.event
-            async def on_ready():
-                logging.info(f'Bot connected as {self.bot.user}')
-                self.is_connected = True
-                
-            await self.bot.login(token)
-            await self.bot.connect()
-            
-            # Wait for connection
-            timeout = 10
-            while not self.is_connected and timeout > 0:
-                await asyncio.sleep(1)
-                timeout -= 1
-                
-            if not self.is_connected:
-                raise Exception("Failed to connect to Discord")
-                
-            return True
-            
-        except Exception as e:
-            logging.error(f"Failed to create bot: {str(e)}")
-            return False
-    
-    async def get_users_without_roles(self, guild_id):
-        """Get list of users without any roles (except @everyone) - WITH SAFETY CHECKS"""
-        if not self.bot or not self.is_connected:
-            return []
-        
-        try:
-            guild = self.bot.get_guild(int(guild_id))
-            if not guild:
-                return []
-            
-            users_without_roles = []
-            excluded_count = 0
-            
-            for member in guild.members:
-                # SAFETY CHECK: Skip bots (including this bot)
-                if member.bot:
-                    excluded_count += 1
-                    continue
-                
-                # SAFETY CHECK: Skip server owner
-                if member.id == guild.owner_id:
-                    excluded_count += 1
-                    continue
-                
-                # SAFETY CHECK: Skip users with administrator permission
-                if member.guild_permissions.administrator:
-                    excluded_count += 1
-                    continue
-                
-                # Check if user has any roles other than @everyone
-                if len(member.roles) <= 1:  # @everyone is always present
-                    users_without_roles.append(member.name)
-            
-            logging.info(f"Found {len(users_without_roles)} users without roles, excluded {excluded_count} protected users")
-            return users_without_roles
-            
-        except Exception as e:
-            logging.error(f"Error getting users without roles: {str(e)}")
-            return []
-    
-    async def remove_users(self, usernames, guild_id, action_type="kick"):
-        """Remove users from Discord server"""
-        if not self.bot or not self.is_connected:
-            return False, "Bot not connected"
-        
-        try:
-            guild = self.bot.get_guild(int(guild_id))
-            if not guild:
-                return False, f"Guild {guild_id} not found"
-            
-            self.removed_users = []
-            self.failed_users = []
-            
-            for username in usernames:
-                try:
-                    # Find member by username (without discriminator) or display name
-                    member = None
-                    
-                    # Try to find by username
-                    for m in guild.members:
-                        if m.name.lower() == username.lower() or m.display_name.lower() == username.lower():
-                            member = m
-                            break
-                    
-                    if member:
-                        # Check if it's the bot itself
-                        if member.id == self.bot.user.id:
-                            self.failed_users.append(f"{username} (Cannot remove bot itself)")
-                            continue
-                            
-                        if action_type == "kick":
-                            await member.kick(reason="Bulk removal via bot")
-                            self.removed_users.append(f"{member.name}#{member.discriminator}")
-                            logging.info(f"Kicked user: {member.name}")
-                        elif action_type == "ban":
-                            await member.ban(reason="Bulk removal via bot")
-                            self.removed_users.append(f"{member.name}#{member.discriminator}")
-                            logging.info(f"Banned user: {member.name}")
-                    else:
-                        self.failed_users.append(f"{username} (User not found)")
-                        logging.warning(f"User not found: {username}")
-                        
-                except Exception as e:
-                    self.failed_users.append(f"{username} (Error: {str(e)})")
-                    logging.error(f"Failed to remove {username}: {str(e)}")
-                    
-                # Small delay to avoid rate limiting
-                await asyncio.sleep(0.5)
-            
-            return True, f"Process completed. Removed: {len(self.removed_users)}, Failed: {len(self.failed_users)}"
-            
-        except Exception as e:
-            logging.error(f"Error in remove_users: {str(e)}")
-            return False, str(e)
-    
-    async def disconnect(self):
-        """Disconnect bot"""
-        if self.bot:
-            await self.bot.close()
-            self.is_connected = False
 
-def process_excel_file(uploaded_file):
-    """Process uploaded Excel file and extract usernames"""
-    try:
-        # Read Excel file
-        df = pd.read_excel(uploaded_file)
-        
-        # Look for username column (case insensitive)
-        username_col = None
-        for col in df.columns:
-            if 'username' in col.lower() or 'discord' in col.lower():
-                username_col = col
-                break
-        
-        if username_col is None:
-            return None, "No username column found. Please ensure your Excel file has a column containing 'username' or 'discord'"
-        
-        # Extract usernames and remove empty values
-        usernames = df[username_col].dropna().astype(str).tolist()
-        usernames = [u.strip() for u in usernames if u.strip()]
-        
-        return usernames, f"Found {len(usernames)} usernames in column '{username_col}'"
-        
-    except Exception as e:
-        return None, f"Error processing Excel file: {str(e)}"
+def get_session(token):
+    """Shared bot session for ``token``; loads discord.py on first use"""
+    from bot_session import get_session
+    return get_session(token)
+
+
+def run_removal_job(job):
+    """Job queue runner, importing the removal code when the first job runs"""
+    from remover import run_removal_job
+    run_removal_job(job)
+
+
+@st.cache_data(show_spinner=False, max_entries=1000)
+def journal_summary(path, modified_ns, size):
+    """Summary of one run journal, read again only when the file changes"""
+    return JournalSummary(path)
+
+
+def cached_journal_summary(path):
+    stat = os.stat(path)
+    return journal_summary(path, stat.st_mtime_ns, stat.st_size)
+
+
+def format_progress(job_id, event):
+    """One-line status for a progress event: count, rate, ETA and rate limits"""
+    text = f"Job {job_id}: processed {event.processed}/{event.total} users · {event.rate:.1f} users/s"
+    if event.eta is not None:
+        text += f" · ETA {event.eta:.0f}s"
+    if event.rate_limited:
+        text += f" · {event.rate_limited} rate limited"
+    return text
+
+
+def collect_finished_jobs(jobs):
+    """Show the results of this session's finished jobs and stop tracking them
+
+    Returns whether any job had finished; the latest one's results are shown.
+    """
+    finished = [job for job in jobs if job.finished]
+    for job in finished:
+        results = st.session_state.results = job.results
+        st.session_state.last_job_metrics = job.metrics
+        st.session_state.last_job_summary = (
+            job.status, job.options["action_type"], results.removed, results.failed, results.not_attempted, job.error
+        )
+        st.session_state.job_ids.remove(job.id)
+    return bool(finished)
+
+
+def watch_jobs(job_queue, jobs, rows):
+    """Render the jobs' progress into their rows until one finishes, then rerun
+
+    Each wait blocks until the running job publishes or finishes, so
+    updates are immediate.
+    """
+    partial_shown = set()
+    while not any(job.finished for job in jobs):
+        for job in jobs:
+            progress_bar, status_text, last_text, partial_download = rows[job.id]
+            latest = job.progress.latest
+            if job.status == QUEUED:
+                ahead = len([j for j in job_queue.jobs() if j.id < job.id and not j.finished])
+                status_text.text(f"Job {job.id} queued behind {ahead} other job(s)...")
+            elif latest is None:
+                status_text.text(f"Job {job.id}: resolving {job.total} users...")
+            else:
+                if latest.total > 0:
+                    progress_bar.progress(min(latest.processed / latest.total, 1.0))
+                status_text.text(format_progress(job.id, latest))
+                last_text.caption(f"Last: {latest.entry} → {latest.outcome}" + (f" ({latest.detail})" if latest.detail else ""))
+            # Results written so far can be downloaded while the job runs
+            writer = job.results.writer
+            if writer and job.id not in partial_shown:
+                partial_download.download_button(
+                    "📥 Download Results So Far",
+                    data=writer.export,
+                    file_name=writer.file_name,
+                    mime=writer.mime,
+                    key=f"partial_results_{job.id}",
+                    # A rerun would interrupt this progress loop
+                    on_click="ignore"
+                )
+                partial_shown.add(job.id)
+        watched = next((job for job in jobs if job.status == RUNNING), jobs[0])
+        latest = watched.progress.latest
+        watched.progress.wait(latest.seq if latest else 0, timeout=1.0)
+
+    # Final results, then refresh to update statistics
+    collect_finished_jobs(jobs)
+    st.rerun()
+
+
+def selected_users(filter_option):
+    """Users selected by the sidebar filter, combining lists without duplicates"""
+    lists = []
+    if filter_option in ["Excel File List", "Both (Excel + No Roles)"]:
+        lists.append(st.session_state.get('usernames') or [])
+    if filter_option in ["Users Without Roles", "Both (Excel + No Roles)"]:
+        lists.append(st.session_state.get('no_role_users') or [])
+    if filter_option == "Custom Filter":
+        lists.append(st.session_state.get('filtered_users') or [])
+    return merge_targets(*lists)
+
 
 def main():
     st.set_page_config(
@@ -195,11 +140,11 @@ def main():
     )
     
     st.title("🤖 Discord User Remover Bot")
-    st.markdown("Upload an Excel file with Discord usernames to remove them from your server")
+    st.markdown("Upload an Excel, CSV or Parquet file with Discord usernames to remove them from your server")
     
     # Initialize session state
-    if 'remover' not in st.session_state:
-        st.session_state.remover = DiscordUserRemover()
+    if 'results' not in st.session_state:
+        st.session_state.results = ResultLog()
     if 'usernames' not in st.session_state:
         st.session_state.usernames = []
     if 'processing' not in st.session_state:
@@ -209,6 +154,11 @@ def main():
     bot_token = os.getenv("DISCORD_BOT_TOKEN") or st.secrets.get("DISCORD_BOT_TOKEN", "")
     guild_id = os.getenv("DISCORD_GUILD_ID") or st.secrets.get("DISCORD_GUILD_ID", "1393935478503243917")
     
+    # Optional Prometheus scrape endpoint, shared by every session in the process
+    metrics_port = os.getenv("DISCORD_METRICS_PORT")
+    if metrics_port:
+        start_metrics_server(int(metrics_port))
+    
     # Sidebar for configuration
     with st.sidebar:
         st.header("⚙️ Bot Configuration")
@@ -224,6 +174,23 @@ def main():
             help="Choose whether to kick or ban users"
         )
         
+        # Batched bans
+        bulk_ban = action_type == "ban" and st.checkbox(
+            "Use bulk ban",
+            value=True,
+            help="Ban up to 200 users per request through Discord's bulk-ban endpoint. "
+                 "Needs the Manage Server permission; without it users are banned one at a time"
+        )
+        
+        # Request concurrency
+        max_in_flight = st.number_input(
+            "Max Concurrent Requests",
+            min_value=1,
+            max_value=50,
+            value=DEFAULT_MAX_IN_FLIGHT,
+            help="Upper bound on simultaneous kick/ban requests. Concurrency backs off automatically when Discord rate limits."
+        )
+        
         # User filter options
         st.subheader("🎯 User Filter Options")
         
@@ -232,7 +199,8 @@ def main():
             [
                 "Excel File List", 
                 "Users Without Roles",
-                "Both (Excel + No Roles)"
+                "Both (Excel + No Roles)",
+                "Custom Filter"
             ],
             help="Choose how to select users for removal"
         )
@@ -246,64 +214,70 @@ def main():
                     try:
                         # Simple validation
                         if bot_token.startswith("MT") and len(bot_token) > 50:
-                            # Test Discord bot creation
-                            import discord
-                            intents = discord.Intents.default()
-                            intents.members = True
-                            intents.guilds = True
-                            
-                            # Create temporary bot for testing
-                            test_bot = discord.Client(intents=intents)
+                            # Connect (or reuse) the shared bot session
+                            session = get_session(bot_token)
                             
-                            @test_bot.event
-                            async def on_ready():
-                                st.success("✅ Connection successful!")
-                                await test_bot.close()
+                            async def check_guild(client):
+                                guild = client.get_guild(int(guild_id))
+                                return guild.name if guild else None, guild.member_count if guild else 0
                             
-                            # Quick token validation
-                            try:
-                                # This will validate the token format
-                                import base64
-                                token_parts = bot_token.split('.')
-                                if len(token_parts) == 3:
-                                    # Decode the first part to get bot ID
-                                    bot_id = base64.b64decode(token_parts[0] + '==').decode('utf-8')
-                                    st.success(f"✅ Token validated! Bot ID: {bot_id}")
-                                    st.success(f"✅ Server ID: {guild_id}")
-                                    st.info("🤖 Ready to use!")
-                                else:
-                                    st.error("❌ Invalid token format")
-                            except Exception as token_err:
-                                st.error(f"❌ Token validation failed: {str(token_err)}")
+                            guild_name, member_count = session.run(check_guild, timeout=30)
+                            st.success(f"✅ Connected as {session.client.user} (Bot ID: {session.client.user.id})")
+                            if guild_name:
+                                st.success(f"✅ Server: {guild_name} ({member_count} members)")
+                                st.info("🤖 Ready to use!")
+                            else:
+                                st.error(f"❌ Bot is not a member of server {guild_id}")
                         else:
                             st.error("❌ Invalid token format. Token should start with 'MT' and be longer than 50 characters.")
                     except Exception as e:
                         st.error(f"❌ Connection error: {str(e)}")
-    
+
+        # Stored member snapshot
+        if st.button("🔄 Refresh Member Snapshot", help="Re-download the member list. Gateway events keep the stored copy current between refreshes."):
+            if not bot_token:
+                st.error("❌ Bot token not found in secrets!")
+            else:
+                with st.spinner("Downloading member list..."):
+                    try:
+                        session = get_session(bot_token)
+
+                        async def refresh_snapshot(client):
+                            guild, snapshot = await session.member_snapshot(int(guild_id), force_refresh=True)
+                            return len(snapshot) if snapshot is not None else None
+
+                        member_count = session.run(refresh_snapshot, timeout=600)
+                        if member_count is None:
+                            st.error(f"❌ Bot is not a member of server {guild_id}")
+                        else:
+                            st.success(f"✅ Stored {member_count} members")
+                    except Exception as e:
+                        st.error(f"❌ Refresh failed: {str(e)}")
+
     # Main content area
     col1, col2 = st.columns([2, 1])
     
     with col1:
         if filter_option in ["Excel File List", "Both (Excel + No Roles)"]:
-            st.header("📊 Upload Excel File")
+            st.header("📊 Upload User File")
             
             uploaded_file = st.file_uploader(
-                "Choose an Excel file",
-                type=['xlsx', 'xls'],
-                help="Excel file should contain a column with Discord usernames"
+                "Choose an Excel, CSV, TSV or Parquet file",
+                type=SUPPORTED_EXTENSIONS,
+                help="File should contain a Discord username column, or a user ID column such as 'User ID' or 'Discord ID' (formatted as text in Excel)"
             )
             
             if uploaded_file is not None:
-                with st.spinner("Processing Excel file..."):
-                    usernames, message = process_excel_file(uploaded_file)
+                with st.spinner("Processing file..."):
+                    usernames, message = process_excel_file(uploaded_file, cache=upload_cache)
                     
                 if usernames:
                     st.success(message)
                     st.session_state.usernames = usernames
                     
                     # Preview usernames
-                    st.subheader("👥 Preview Usernames from Excel")
-                    preview_df = pd.DataFrame(usernames[:10], columns=["Discord Username"])
+                    st.subheader("👥 Preview Usernames from File")
+                    preview_df = {"Discord Username / ID": [str(u) for u in usernames[:10]]}
                     st.dataframe(preview_df, use_container_width=True)
                     
                     if len(usernames) > 10:
@@ -329,86 +303,13 @@ def main():
             if st.button("🔍 Find Users Without Roles"):
                 with st.spinner("Scanning server for users without roles..."):
                     try:
-                        import asyncio
-                        import discord
+                        session = get_session(bot_token)
                         
-                        # Simplified approach without complex async operations
-                        def find_no_role_users():
-                            try:
-                                # Create Discord client
-                                intents = discord.Intents.default()
-                                intents.members = True
-                                intents.guilds = True
-                                
-                                client = discord.Client(intents=intents)
-                                found_users = []
-                                
-                                @client.event
-                                async def on_ready():
-                                    try:
-                                        guild = client.get_guild(int(guild_id))
-                                        if guild:
-                                            excluded_count = 0
-                                            for member in guild.members:
-                                                # SAFETY CHECKS
-                                                if member.bot:
-                                                    excluded_count += 1
-                                                    continue
-                                                if member.id == guild.owner_id:
-                                                    excluded_count += 1
-                                                    continue
-                                                if member.guild_permissions.administrator:
-                                                    excluded_count += 1
-                                                    continue
-                                                
-                                                # Check if user has only @everyone role
-                                                if len(member.roles) <= 1:
-                                                    found_users.append(member.name)
-                                            
-                                            logging.info(f"Found {len(found_users)} users without roles, excluded {excluded_count} protected users")
-                                        
-                                    except Exception as e:
-                                        logging.error(f"Error in on_ready: {str(e)}")
-                                    finally:
-                                        await client.close()
-                                
-                                # Run bot briefly to get data
-                                try:
-                                    import threading
-                                    import time
-                                    
-                                    def run_bot():
-                                        loop = asyncio.new_event_loop()
-                                        asyncio.set_event_loop(loop)
-                                        try:
-                                            loop.run_until_complete(client.start(bot_token))
-                                        except Exception as e:
-                                            logging.error(f"Bot error: {str(e)}")
-                                        finally:
-                                            loop.close()
-                                    
-                                    bot_thread = threading.Thread(target=run_bot)
-                                    bot_thread.daemon = True
-                                    bot_thread.start()
-                                    
-                                    # Wait for results
-                                    timeout = 10
-                                    while len(found_users) == 0 and timeout > 0:
-                                        time.sleep(1)
-                                        timeout -= 1
-                                    
-                                    return found_users
-                                    
-                                except Exception as e:
-                                    logging.error(f"Threading error: {str(e)}")
-                                    return []
-                                    
-                            except Exception as e:
-                                logging.error(f"Discord client error: {str(e)}")
-                                return []
+                        # Read the session's live no-roles index instead of scanning members
+                        async def find_no_role_users(client):
+                            return await session.users_without_roles(guild_id)
                         
-                        # Execute the function
-                        no_role_users = find_no_role_users()
+                        no_role_users = session.run(find_no_role_users)
                         
                         if no_role_users:
                             st.session_state.no_role_users = no_role_users
@@ -416,7 +317,7 @@ def main():
                             
                             # Preview users without roles
                             st.subheader("👥 Users Without Roles Preview")
-                            preview_df = pd.DataFrame(no_role_users[:10], columns=["Discord Username"])
+                            preview_df = {"Discord Username": no_role_users[:10]}
                             st.dataframe(preview_df, use_container_width=True)
                             
                             if len(no_role_users) > 10:
@@ -432,6 +333,127 @@ def main():
             # Initialize if not exists
             if 'no_role_users' not in st.session_state:
                 st.session_state.no_role_users = []
+            
+            # Server-side prune fast path
+            if filter_option == "Users Without Roles":
+                with st.expander("⚡ Fast Path: Server-Side Prune"):
+                    st.caption("Kicks every user without roles who has been inactive for the chosen number of days "
+                               "in a single request. Bots, the server owner and administrators are never affected; "
+                               "the prune is refused if any bot has no roles.")
+                    
+                    prune_days = st.slider("Inactive for at least (days)", min_value=1, max_value=30, value=30)
+                    
+                    def run_prune(dry_run):
+                        session = get_session(bot_token)
+                        
+                        async def prune_operation(client):
+                            from remover import DiscordUserRemover
+                            guild, snapshot = await session.member_snapshot(guild_id)
+                            remover = DiscordUserRemover()
+                            remover.attach(client, session.rate_limits)
+                            return await remover.prune_users_without_roles(guild_id, prune_days, dry_run=dry_run, snapshot=snapshot)
+                        return session.run(prune_operation)
+                    
+                    prune_col1, prune_col2 = st.columns(2)
+                    
+                    with prune_col1:
+                        if st.button("🔎 Estimate Prune"):
+                            with st.spinner("Estimating prune..."):
+                                try:
+                                    success, count, message = run_prune(dry_run=True)
+                                    if success:
+                                        st.session_state.prune_estimate = (prune_days, count)
+                                        st.info(f"ℹ️ {message}")
+                                    else:
+                                        st.error(f"❌ {message}")
+                                except Exception as e:
+                                    st.error(f"❌ Error estimating prune: {str(e)}")
+                    
+                    with prune_col2:
+                        # The estimate (dry run) must be taken for the same window before pruning
+                        estimate = st.session_state.get('prune_estimate')
+                        if st.button("✂️ Prune Now",
+                                     disabled=action_type != "kick" or not estimate or estimate[0] != prune_days,
+                                     help="Prune always kicks. Run an estimate for the selected days first."):
+                            with st.spinner("Pruning..."):
+                                try:
+                                    success, count, message = run_prune(dry_run=False)
+                                    if success:
+                                        st.success(f"✅ {message}")
+                                    else:
+                                        st.error(f"❌ {message}")
+                                except Exception as e:
+                                    st.error(f"❌ Error pruning: {str(e)}")
+                                finally:
+                                    st.session_state.prune_estimate = None
+        
+        # Custom filter section
+        if filter_option == "Custom Filter":
+            from member_filters import (
+                All, Any, AccountYoungerThan, HasNoRoles, JoinedBefore, LacksRoles, PendingScreening, resolve_roles,
+                select_members, split_role_names
+            )
+            
+            st.header("🧩 Custom Filter")
+            
+            st.warning("🛡️ **SAFETY FEATURES ENABLED:** bots, the server owner and administrators "
+                       "are always excluded, whatever the filter matches")
+            
+            predicates = []
+            excluded_roles = None
+            if st.checkbox("Joined more than N days ago"):
+                joined_days = st.number_input("Joined at least (days ago)", min_value=1, value=30)
+                predicates.append(JoinedBefore(joined_days))
+            if st.checkbox("Has none of these roles"):
+                excluded_roles = split_role_names(st.text_input("Role names or IDs (comma separated)"))
+                if not excluded_roles:
+                    st.caption("Enter at least one role")
+            if st.checkbox("Has no roles at all"):
+                predicates.append(HasNoRoles())
+            if st.checkbox("Account younger than N days"):
+                account_days = st.number_input("Account created within (days)", min_value=1, value=7)
+                predicates.append(AccountYoungerThan(account_days))
+            if st.checkbox("Pending membership screening"):
+                predicates.append(PendingScreening())
+            
+            combine = st.radio("Match", ["All conditions (AND)", "Any condition (OR)"], horizontal=True)
+            
+            # An empty role list would match every member
+            if st.button("🔍 Find Matching Users", disabled=(not predicates and excluded_roles is None) or excluded_roles == []):
+                with st.spinner("Filtering server members..."):
+                    try:
+                        session = get_session(bot_token)
+                        
+                        async def find_filtered_users(client):
+                            guild, snapshot = await session.member_snapshot(guild_id)
+                            if snapshot is None:
+                                raise Exception("Server not found")
+                            # Role names resolve against the guild's current roles
+                            conditions = list(predicates)
+                            if excluded_roles is not None:
+                                conditions.append(LacksRoles(resolve_roles(guild, excluded_roles)))
+                            predicate = All(*conditions) if combine.startswith("All") else Any(*conditions)
+                            matched = select_members(snapshot, predicate, client.user.id)
+                            return str(predicate), matched["id"].tolist(), matched["name"].tolist()
+                        
+                        description, user_ids, names = session.run(find_filtered_users)
+                        # Matched members are acted on by ID, so names never need resolving
+                        st.session_state.filtered_users = user_ids
+                        st.success(f"✅ Found {len(user_ids)} users matching {description}")
+                        
+                        if user_ids:
+                            preview_df = {"User ID": user_ids[:10], "Discord Username": names[:10]}
+                            st.dataframe(preview_df, use_container_width=True)
+                            if len(user_ids) > 10:
+                                st.info(f"Showing first 10 users. Total: {len(user_ids)}")
+                    except Exception as e:
+                        st.error(f"❌ Error filtering users: {str(e)}")
+                        st.session_state.filtered_users = []
+            
+            if 'filtered_users' not in st.session_state:
+                st.session_state.filtered_users = []
+    
+    users_to_process = selected_users(filter_option)
     
     with col2:
         st.header("📈 Statistics")
@@ -444,294 +466,202 @@ def main():
         if filter_option in ["Users Without Roles", "Both (Excel + No Roles)"] and 'no_role_users' in st.session_state:
             st.metric("Users Without Roles", len(st.session_state.no_role_users))
         
+        # Custom filter statistics
+        if filter_option == "Custom Filter" and 'filtered_users' in st.session_state:
+            st.metric("Users Matching Filter", len(st.session_state.filtered_users))
+        
         # Total users to process
-        total_users = 0
-        if filter_option == "Excel File List":
-            total_users = len(st.session_state.usernames) if st.session_state.usernames else 0
-        elif filter_option == "Users Without Roles":
-            total_users = len(st.session_state.no_role_users) if 'no_role_users' in st.session_state else 0
-        elif filter_option == "Both (Excel + No Roles)":
-            excel_users = len(st.session_state.usernames) if st.session_state.usernames else 0
-            no_role_users = len(st.session_state.no_role_users) if 'no_role_users' in st.session_state else 0
-            # Combine and remove duplicates
-            combined_users = set(st.session_state.usernames if st.session_state.usernames else [])
-            combined_users.update(st.session_state.no_role_users if 'no_role_users' in st.session_state else [])
-            total_users = len(combined_users)
+        total_users = len(users_to_process)
         
         if total_users > 0:
             st.metric("Total Users to Process", total_users)
         
         # Results metrics
-        if hasattr(st.session_state.remover, 'removed_users') and hasattr(st.session_state.remover, 'failed_users'):
-            removed_count = len(st.session_state.remover.removed_users)
-            failed_count = len(st.session_state.remover.failed_users)
+        removed_count = st.session_state.results.removed
+        failed_count = st.session_state.results.failed
+        
+        if removed_count > 0 or failed_count > 0:
+            st.divider()
+            st.subheader("📊 Results")
             
-            if removed_count > 0 or failed_count > 0:
-                st.divider()
-                st.subheader("📊 Results")
+            if removed_count > 0:
+                st.metric("✅ Successfully Removed", removed_count, delta=f"+{removed_count}")
                 
-                if removed_count > 0:
-                    st.metric("✅ Successfully Removed", removed_count, delta=f"+{removed_count}")
-                    
-                if failed_count > 0:
-                    st.metric("❌ Failed Attempts", failed_count, delta=f"+{failed_count}")
-                
-                # Success rate
-                total_processed = removed_count + failed_count
-                if total_processed > 0:
-                    success_rate = (removed_count / total_processed) * 100
-                    st.metric("📈 Success Rate", f"{success_rate:.1f}%")
+            if failed_count > 0:
+                st.metric("❌ Failed Attempts", failed_count, delta=f"+{failed_count}")
+            
+            # Success rate
+            total_processed = removed_count + failed_count
+            if total_processed > 0:
+                success_rate = (removed_count / total_processed) * 100
+                st.metric("📈 Success Rate", f"{success_rate:.1f}%")
+        
+        # Where the last run spent its time
+        run_metrics = st.session_state.get('last_job_metrics')
+        if run_metrics is not None:
+            with st.expander("⏱️ Run Timing"):
+                bucket_wait = sum(histogram.total for histogram in run_metrics.bucket_waits.values())
+                chunking = run_metrics.phases.get("chunking")
+                st.metric("Users / second", f"{run_metrics.users_per_second:.1f}")
+                st.metric("Rate limited (429)", run_metrics.rate_limited)
+                st.metric("Retried requests", run_metrics.retried)
+                st.metric("Rate-limit bucket wait", f"{bucket_wait:.1f}s")
+                st.metric("Member chunking", f"{chunking.total:.1f}s" if chunking else "—")
+                rows = run_metrics.route_rows()
+                if rows:
+                    st.dataframe(rows, use_container_width=True, hide_index=True)
+            st.download_button(
+                "📤 Export Metrics (Prometheus)",
+                data=process_metrics.to_prometheus(),
+                file_name="discord_remover_metrics.prom",
+                mime="text/plain"
+            )
     
     # Determine if we have users to process
-    has_users_to_process = False
-    users_to_process = []
+    has_users_to_process = bool(users_to_process)
+    
+    # Removal runs execute on a process-wide job queue, independent of this script run;
+    # this session can queue further runs behind its active ones
+    job_queue = get_job_queue("removals", run_removal_job)
+    if 'job_ids' not in st.session_state:
+        st.session_state.job_ids = []
+    
+    active_jobs = [job for job in map(job_queue.status, st.session_state.job_ids) if job is not None]
+    if collect_finished_jobs(active_jobs):
+        # Refresh statistics with the finished job's results
+        st.rerun()
+    st.session_state.processing = bool(active_jobs)
     
-    if filter_option == "Excel File List" and st.session_state.usernames:
-        has_users_to_process = True
-        users_to_process = st.session_state.usernames
-    elif filter_option == "Users Without Roles" and 'no_role_users' in st.session_state and st.session_state.no_role_users:
-        has_users_to_process = True
-        users_to_process = st.session_state.no_role_users
-    elif filter_option == "Both (Excel + No Roles)":
-        # Combine both lists and remove duplicates
-        combined_users = set()
-        if st.session_state.usernames:
-            combined_users.update(st.session_state.usernames)
-        if 'no_role_users' in st.session_state and st.session_state.no_role_users:
-            combined_users.update(st.session_state.no_role_users)
-        if combined_users:
-            has_users_to_process = True
-            users_to_process = list(combined_users)
+    def submit_job(entries, **options):
+        st.session_state.job_ids.append(job_queue.submit(entries, bot_token=bot_token, **options))
+        st.session_state.last_job_summary = None
+        st.rerun()
+    
+    def stop_active_jobs():
+        for job in active_jobs:
+            job_queue.cancel(job.id)
     
     # Action buttons
-    if has_users_to_process:
+    if has_users_to_process or active_jobs:
         st.header("🚀 Execute Actions")
         
         col1, col2, col3 = st.columns([1, 1, 2])
         
         with col1:
-            if st.button(f"🗑️ {action_type.title()} All Users", type="primary", disabled=st.session_state.processing):
-                st.session_state.processing = True
-                st.session_state.current_users_to_process = users_to_process
+            if st.button(f"🗑️ {action_type.title()} All Users", type="primary", disabled=not has_users_to_process,
+                         help="Queued behind this session's active jobs" if active_jobs else None):
+                run_options = {
+                    "guild_id": guild_id,
+                    "action_type": action_type,
+                    "max_in_flight": int(max_in_flight),
+                    "bulk_ban": bulk_ban
+                }
+                journal = RunJournal.create(users_to_process, run_options)
+                submit_job(users_to_process, journal_path=journal.path, **run_options)
                 
         with col2:
-            if st.button("🛑 Stop Process", disabled=not st.session_state.processing):
-                st.session_state.processing = False
-                st.info("Process stopped by user")
+            if st.button("🛑 Stop Process", disabled=not active_jobs, on_click=stop_active_jobs):
+                st.info("Stop requested")
         
-        # Execute removal process - REAL DISCORD API
-        if st.session_state.processing:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+        # Each active job of this session gets its own status and progress row - REAL DISCORD API;
+        # the rows are filled in by watch_jobs once the rest of the page has rendered
+        rows = {}
+        if active_jobs:
+            for job in active_jobs:
+                job_col1, job_col2 = st.columns([4, 1])
+                with job_col1:
+                    rows[job.id] = (st.progress(0), st.empty(), st.empty(), st.empty())
+                with job_col2:
+                    st.button("Cancel", key=f"cancel_job_{job.id}", on_click=job_queue.cancel, args=(job.id,))
+        
+        # Summary of the last finished job
+        summary = st.session_state.get('last_job_summary')
+        if summary:
+            status, job_action, removed_count, failed_count, not_attempted_count, error = summary
             
-            try:
-                status_text.text("Connecting to Discord...")
-                
-                import discord
-                import asyncio
-                import threading
-                from concurrent.futures import ThreadPoolExecutor
-                
-                # Initialize results storage
-                if not hasattr(st.session_state.remover, 'removed_users'):
-                    st.session_state.remover.removed_users = []
-                if not hasattr(st.session_state.remover, 'failed_users'):
-                    st.session_state.remover.failed_users = []
-                
-                st.session_state.remover.removed_users = []
-                st.session_state.remover.failed_users = []
-                
-                current_users = getattr(st.session_state, 'current_users_to_process', [])
-                total_users = len(current_users)
-                
-                # Create results containers
-                results = {"removed": [], "failed": [], "completed": False}
-                
-                async def discord_bot_operations():
-                    try:
-                        # Setup Discord bot
-                        intents = discord.Intents.default()
-                        intents.members = True
-                        intents.guilds = True
-                        
-                        client = discord.Client(intents=intents)
-                        
-                        @client.event
-                        async def on_ready():
-                            try:
-                                # Get guild
-                                guild = client.get_guild(int(guild_id))
-                                if not guild:
-                                    results["failed"].append("Server not found")
-                                    await client.close()
-                                    return
-                                
-                                # Process each user
-                                for i, username in enumerate(current_users):
-                                    try:
-                                        # Find member by username
-                                        member = None
-                                        for m in guild.members:
-                                            if (m.name.lower() == username.lower() or 
-                                                m.display_name.lower() == username.lower()):
-                                                member = m
-                                                break
-                                        
-                                        if member:
-                                            # SAFETY CHECK: Don't remove bots
-                                            if member.bot:
-                                                results["failed"].append(f"{username} (Cannot remove bots)")
-                                                continue
-                                            
-                                            # SAFETY CHECK: Don't remove server owner
-                                            if member.id == guild.owner_id:
-                                                results["failed"].append(f"{username} (Cannot remove server owner)")
-                                                continue
-                                            
-                                            # SAFETY CHECK: Don't remove administrators
-                                            if member.guild_permissions.administrator:
-                                                results["failed"].append(f"{username} (Cannot remove administrators)")
-                                                continue
-                                            
-                                            # SAFETY CHECK: Don't remove this bot
-                                            if member.id == client.user.id:
-                                                results["failed"].append(f"{username} (Cannot remove bot)")
-                                                continue
-                                            
-                                            # Perform action
-                                            if action_type == "kick":
-                                                await member.kick(reason="Bulk removal via bot")
-                                                results["removed"].append(f"{member.name}#{member.discriminator}")
-                                            elif action_type == "ban":
-                                                await member.ban(reason="Bulk removal via bot", delete_message_days=0)
-                                                results["removed"].append(f"{member.name}#{member.discriminator}")
-                                                
-                                        else:
-                                            results["failed"].append(f"{username} (User not found)")
-                                        
-                                        # Small delay to respect rate limits
-                                        await asyncio.sleep(1)
-                                        
-                                    except discord.Forbidden:
-                                        results["failed"].append(f"{username} (No permission)")
-                                    except discord.HTTPException as e:
-                                        results["failed"].append(f"{username} (Discord error: {str(e)})")
-                                    except Exception as e:
-                                        results["failed"].append(f"{username} (Error: {str(e)})")
-                                
-                                results["completed"] = True
-                                
-                            except Exception as e:
-                                results["failed"].append(f"Bot error: {str(e)}")
-                            finally:
-                                await client.close()
-                        
-                        # Start bot
-                        await client.start(bot_token)
-                        
-                    except Exception as e:
-                        results["failed"].append(f"Connection error: {str(e)}")
-                        results["completed"] = True
-                
-                # Run Discord operations in thread
-                def run_discord_ops():
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    try:
-                        loop.run_until_complete(discord_bot_operations())
-                    except Exception as e:
-                        results["failed"].append(f"Thread error: {str(e)}")
-                        results["completed"] = True
-                    finally:
-                        loop.close()
-                
-                # Start Discord bot in separate thread
-                bot_thread = threading.Thread(target=run_discord_ops)
-                bot_thread.daemon = True
-                bot_thread.start()
-                
-                # Wait and show progress
-                progress_bar.progress(0.1)
-                status_text.text(f"Starting {action_type} process...")
-                
-                # Monitor progress
-                timeout = 300  # 5 minutes timeout
-                start_time = time.time()
-                
-                while not results["completed"] and (time.time() - start_time) < timeout:
-                    # Update progress based on results
-                    processed = len(results["removed"]) + len(results["failed"])
-                    if total_users > 0:
-                        progress = 0.1 + (0.8 * processed / total_users)
-                        progress_bar.progress(min(progress, 0.9))
-                    
-                    if processed > 0:
-                        status_text.text(f"Processed {processed}/{total_users} users...")
-                    
-                    time.sleep(2)
-                
-                # Final results
-                st.session_state.remover.removed_users = results["removed"]
-                st.session_state.remover.failed_users = results["failed"]
-                
-                progress_bar.progress(1.0)
-                status_text.text("Process completed!")
-                
-                # Show final results
-                removed_count = len(results["removed"])
-                failed_count = len(results["failed"])
-                
-                if removed_count > 0:
-                    st.success(f"✅ Successfully {action_type}ed {removed_count} users from Discord!")
-                
-                if failed_count > 0:
-                    st.warning(f"⚠️ Failed to process {failed_count} users")
-                
-                if removed_count == 0 and failed_count == 0:
-                    st.info("No users were processed")
-                
-                # Force refresh to update statistics
-                time.sleep(1)
-                st.rerun()
-                
-            except Exception as e:
-                st.error(f"Unexpected error: {str(e)}")
-            finally:
-                st.session_state.processing = False
-                status_text.empty()
+            if status == FAILED:
+                st.error(f"Unexpected error: {error}")
+            if status == CANCELLED:
+                st.info("Process stopped by user")
+                if not_attempted_count > 0:
+                    st.info(f"{not_attempted_count} users were not attempted and can be resumed below")
+            
+            if removed_count > 0:
+                st.success(f"✅ Successfully {job_action}ed {removed_count} users from Discord!")
+            
+            if failed_count > 0:
+                st.warning(f"⚠️ Failed to process {failed_count} users")
+            
+            if removed_count == 0 and failed_count == 0 and status == COMPLETED:
+                st.info("No users were processed")
+    
+    # Interrupted runs that can be resumed from their journal
+    active_journals = {job.options["journal_path"] for job in job_queue.jobs() if not job.finished}
+    resumable = [j for j in list_journals(summarize=cached_journal_summary) if j.resumable and j.path not in active_journals]
+    if resumable:
+        with st.expander(f"♻️ Resume Interrupted Runs ({len(resumable)})"):
+            st.caption("Resuming skips users already removed and retries only untouched users and transient failures.")
+            for journal in resumable[:10]:
+                journal_col1, journal_col2 = st.columns([3, 1])
+                with journal_col1:
+                    st.text(f"{journal.run_id} · {journal.options['action_type']} · "
+                            f"removed {journal.removed_count} · remaining {journal.pending_count} · "
+                            f"{journal.finished_status or 'interrupted'}")
+                with journal_col2:
+                    if st.button("Resume", key=f"resume_{journal.run_id}"):
+                        # Only the run being resumed has its outcomes replayed
+                        submit_job(RunJournal(journal.path).pending(), journal_path=journal.path, **journal.options)
+    
+    # Job queue overview
+    jobs = job_queue.jobs()
+    if jobs:
+        with st.expander(f"🗂️ Job Queue ({len([j for j in jobs if not j.finished])} active)"):
+            jobs_df = [
+                {
+                    "Job": job.id,
+                    "Action": job.options["action_type"],
+                    "Status": job.status,
+                    "Processed": f"{job.processed}/{job.total}",
+                    "Submitted": datetime.fromtimestamp(job.submitted_at).strftime("%H:%M:%S")
+                }
+                for job in reversed(jobs)
+            ]
+            st.dataframe(jobs_df, use_container_width=True, hide_index=True)
     
     # Results section
-    if hasattr(st.session_state.remover, 'removed_users') and (st.session_state.remover.removed_users or st.session_state.remover.failed_users):
+    results = st.session_state.results
+    if results.removed or results.failed:
         st.header("📋 Results")
         
         col1, col2 = st.columns(2)
         
         with col1:
-            if st.session_state.remover.removed_users:
+            if results.removed:
                 st.subheader("✅ Successfully Removed")
-                removed_df = pd.DataFrame(st.session_state.remover.removed_users, columns=["Username"])
+                removed_df = results.columns(Outcome.REMOVED, fields=["entry", "user_id", "latency"])
                 st.dataframe(removed_df, use_container_width=True)
         
         with col2:
-            if st.session_state.remover.failed_users:
+            if results.failed:
                 st.subheader("❌ Failed to Remove")
-                failed_df = pd.DataFrame(st.session_state.remover.failed_users, columns=["Username (Reason)"])
+                failed_df = results.columns(Outcome.FAILED, Outcome.REJECTED, fields=["entry", "user_id", "error", "status", "code"])
                 st.dataframe(failed_df, use_container_width=True)
         
-        # Download results
-        if st.button("📥 Download Results"):
-            results_data = {
-                'Timestamp': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")] * (len(st.session_state.remover.removed_users) + len(st.session_state.remover.failed_users)),
-                'Username': st.session_state.remover.removed_users + st.session_state.remover.failed_users,
-                'Status': ['Success'] * len(st.session_state.remover.removed_users) + ['Failed'] * len(st.session_state.remover.failed_users)
-            }
-            
-            results_df = pd.DataFrame(results_data)
-            csv = results_df.to_csv(index=False)
-            
+        if len(results.records) < results.total:
+            st.caption(f"Showing the latest {len(results.records)} of {results.total} results; the download has all of them.")
+        
+        # Download results, copied from the files streamed during the run
+        if results.writer:
+            st.download_button(
+                "📥 Download Results",
+                data=results.writer.export,
+                file_name=results.writer.file_name,
+                mime=results.writer.mime
+            )
+        else:
             st.download_button(
-                label="Download Results as CSV",
-                data=csv,
+                "📥 Download Results",
+                data=lambda: results.to_frame().to_csv(index=False),
                 file_name=f"discord_removal_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv"
             )
@@ -747,6 +677,10 @@ def main():
         """,
         unsafe_allow_html=True
     )
+    
+    # Blocks until one of this session's jobs finishes, so it renders last
+    if active_jobs:
+        watch_jobs(job_queue, active_jobs, rows)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,225 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# Discord snowflakes count milliseconds from this epoch in their top 42 bits
+DISCORD_EPOCH_MS = 1420070400000
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+class RoleBitsets:
+    """Role membership of every snapshot member as fixed-width bitsets
+
+    Each role gets one bit; a member's roles are packed into a row of
+    ``uint64`` words, so "has any of these roles" is one AND per word.
+    """
+
+    def __init__(self, snapshot):
+        exploded = snapshot["role_ids"].reset_index(drop=True).explode().dropna()
+        role_ids = pd.unique(exploded.astype("int64"))
+        self.bits = {int(role_id): bit for bit, role_id in enumerate(role_ids)}
+        words = max(1, (len(self.bits) + 63) // 64)
+        self.matrix = np.zeros((len(snapshot), words), dtype=np.uint64)
+
+        if len(exploded):
+            rows = exploded.index.to_numpy()
+            bits = exploded.astype("int64").map(self.bits).to_numpy()
+            np.bitwise_or.at(
+                self.matrix,
+                (rows, bits // 64),
+                np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64))
+            )
+
+    def mask(self, role_ids):
+        """Bitset of ``role_ids``; roles no member has are ignored"""
+        mask = np.zeros(self.matrix.shape[1], dtype=np.uint64)
+        for role_id in role_ids:
+            bit = self.bits.get(int(role_id))
+            if bit is not None:
+                mask[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return mask
+
+    def has_any(self, role_ids):
+        return (self.matrix & self.mask(role_ids)).any(axis=1)
+
+
+class FilterContext:
+    """Shared state for one evaluation: the snapshot, its role bitsets and a fixed clock"""
+
+    def __init__(self, snapshot, now=None):
+        self.snapshot = snapshot
+        self.now = time.time() if now is None else now
+        self._role_bitsets = None
+
+    @property
+    def role_bitsets(self):
+        # Built on first use, then shared by every role predicate
+        if self._role_bitsets is None:
+            self._role_bitsets = RoleBitsets(self.snapshot)
+        return self._role_bitsets
+
+    def cutoff(self, days):
+        return pd.Timestamp(self.now - days * DAY_SECONDS, unit="s", tz="UTC")
+
+
+class Predicate:
+    """A member condition evaluated as a boolean mask over a snapshot"""
+
+    def evaluate(self, context):
+        raise NotImplementedError
+
+    def __and__(self, other):
+        return All(self, other)
+
+    def __or__(self, other):
+        return Any(self, other)
+
+
+class HasNoRoles(Predicate):
+    """Member has no roles besides @everyone"""
+
+    def evaluate(self, context):
+        return (context.snapshot["role_count"] == 0).to_numpy()
+
+    def __str__(self):
+        return "has no roles"
+
+
+class JoinedBefore(Predicate):
+    """Member joined the server more than ``days`` days ago"""
+
+    def __init__(self, days):
+        self.days = days
+
+    def evaluate(self, context):
+        joined_at = context.snapshot["joined_at"]
+        return (joined_at.notna() & (joined_at < context.cutoff(self.days))).to_numpy()
+
+    def __str__(self):
+        return f"joined more than {self.days} days ago"
+
+
+class LacksRoles(Predicate):
+    """Member has none of ``role_ids``; at least one role is required"""
+
+    def __init__(self, role_ids):
+        self.role_ids = list(role_ids)
+        # With no roles every member would match
+        if not self.role_ids:
+            raise ValueError("Has none of these roles needs at least one role")
+
+    def evaluate(self, context):
+        return ~context.role_bitsets.has_any(self.role_ids)
+
+    def __str__(self):
+        return f"has none of {len(self.role_ids)} roles"
+
+
+class AccountYoungerThan(Predicate):
+    """Member's Discord account was created less than ``days`` days ago"""
+
+    def __init__(self, days):
+        self.days = days
+
+    def evaluate(self, context):
+        # Creation time is encoded in the user ID itself
+        created_ms = (context.snapshot["id"].to_numpy(dtype=np.int64) >> 22) + DISCORD_EPOCH_MS
+        return created_ms > (context.now - self.days * DAY_SECONDS) * 1000
+
+    def __str__(self):
+        return f"account younger than {self.days} days"
+
+
+class PendingScreening(Predicate):
+    """Member has not yet passed membership screening"""
+
+    def evaluate(self, context):
+        return context.snapshot["pending"].to_numpy(dtype=bool)
+
+    def __str__(self):
+        return "pending membership screening"
+
+
+class All(Predicate):
+    """Every predicate matches (AND)"""
+
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def evaluate(self, context):
+        mask = np.ones(len(context.snapshot), dtype=bool)
+        for predicate in self.predicates:
+            mask &= predicate.evaluate(context)
+        return mask
+
+    def __str__(self):
+        return " AND ".join(f"({predicate})" for predicate in self.predicates)
+
+
+class Any(Predicate):
+    """At least one predicate matches (OR)"""
+
+    def __init__(self, *predicates):
+        self.predicates = predicates
+
+    def evaluate(self, context):
+        mask = np.zeros(len(context.snapshot), dtype=bool)
+        for predicate in self.predicates:
+            mask |= predicate.evaluate(context)
+        return mask
+
+    def __str__(self):
+        return " OR ".join(f"({predicate})" for predicate in self.predicates)
+
+
+def safety_mask(snapshot, bot_user_id=None):
+    """Members that may never be selected: bots, the server owner, administrators and this bot"""
+    protected = snapshot["bot"] | snapshot["owner"] | snapshot["admin"]
+    if bot_user_id is not None:
+        protected = protected | (snapshot["id"] == bot_user_id)
+    return protected.to_numpy(dtype=bool)
+
+
+def select_members(snapshot, predicate, bot_user_id=None, now=None):
+    """Rows of the snapshot matching ``predicate`` - WITH SAFETY CHECKS
+
+    The predicate tree is evaluated into one mask over shared role bitsets,
+    then the safety exclusions are always applied as the final stage.
+    """
+    mask = predicate.evaluate(FilterContext(snapshot, now))
+    # SAFETY CHECK: mandatory, whatever the predicate selected
+    mask = mask & ~safety_mask(snapshot, bot_user_id)
+    return snapshot[mask]
+
+
+def users_without_roles(snapshot):
+    """Rows of members with no roles except @everyone - WITH SAFETY CHECKS
+
+    Bots, the server owner and administrators are excluded.
+    """
+    return select_members(snapshot, HasNoRoles())
+
+
+def split_role_names(text):
+    """Non-empty role names or IDs from comma separated ``text``"""
+    return [name.strip() for name in str(text).split(",") if name.strip()]
+
+
+def resolve_roles(guild, names):
+    """Map role names or IDs to role IDs; raises ValueError for unknown roles"""
+    roles_by_name = {role.name.casefold(): role.id for role in guild.roles}
+    role_ids = {role.id for role in guild.roles}
+    resolved = []
+    for name in names:
+        name = str(name).strip()
+        if not name:
+            continue
+        if name.isdigit() and int(name) in role_ids:
+            resolved.append(int(name))
+        elif name.casefold() in roles_by_name:
+            resolved.append(roles_by_name[name.casefold()])
+        else:
+            raise ValueError(f"Unknown role: {name}")
+    return resolved
@@ -0,0 +1,144 @@
+import logging
+
+import pandas as pd
+
+from safety import is_user_id
+
+SNAPSHOT_COLUMNS = [
+    "id", "name", "discriminator", "global_name", "display_name",
+    "role_ids", "role_count", "bot", "admin", "owner", "joined_at", "pending"
+]
+
+# Explicit dtypes, so an empty snapshot has the same column types as a full one
+SNAPSHOT_DTYPES = {
+    "id": "int64", "name": object, "discriminator": object, "global_name": object, "display_name": object,
+    "role_ids": object, "role_count": "int64", "bot": bool, "admin": bool, "owner": bool, "pending": bool
+}
+
+
+def build_member_snapshot(guild, members=None):
+    """Columnar snapshot of the guild's members (or of ``members``) as a DataFrame"""
+    members = guild.members if members is None else members
+    columns = {column: [] for column in SNAPSHOT_COLUMNS}
+
+    for member in members:
+        columns["id"].append(member.id)
+        columns["name"].append(member.name)
+        columns["discriminator"].append(getattr(member, "discriminator", "0"))
+        columns["global_name"].append(getattr(member, "global_name", None))
+        columns["display_name"].append(member.display_name)
+        # @everyone shares the guild's ID and is implied
+        role_ids = tuple(role.id for role in member.roles if role.id != guild.id)
+        columns["role_ids"].append(role_ids)
+        columns["role_count"].append(len(role_ids))
+        columns["bot"].append(member.bot)
+        columns["admin"].append(member.guild_permissions.administrator)
+        columns["owner"].append(member.id == guild.owner_id)
+        columns["joined_at"].append(member.joined_at)
+        columns["pending"].append(bool(getattr(member, "pending", False)))
+
+    snapshot = pd.DataFrame(columns, columns=SNAPSHOT_COLUMNS).astype(SNAPSHOT_DTYPES)
+    snapshot["joined_at"] = pd.to_datetime(snapshot["joined_at"], utc=True)
+    logging.info(f"Built member snapshot with {len(snapshot)} members")
+    return snapshot
+
+
+def _name_keys(snapshot):
+    """Username keys (unique per member) and display/global name keys (possibly shared)"""
+    usernames = pd.DataFrame({"key": snapshot["name"].str.casefold(), "id": snapshot["id"]})
+    legacy = snapshot[snapshot["discriminator"].fillna("0") != "0"]
+    legacy_usernames = pd.DataFrame({
+        "key": (legacy["name"] + "#" + legacy["discriminator"]).str.casefold(),
+        "id": legacy["id"]
+    })
+    usernames = pd.concat([usernames, legacy_usernames], ignore_index=True).drop_duplicates()
+
+    display_names = pd.concat([
+        pd.DataFrame({"key": snapshot["display_name"].str.casefold(), "id": snapshot["id"]}),
+        pd.DataFrame({"key": snapshot["global_name"].dropna().str.casefold(), "id": snapshot.loc[snapshot["global_name"].notna(), "id"]})
+    ], ignore_index=True).drop_duplicates()
+    # A member's display name equal to its own username is already covered by the username tier
+    display_names = display_names.merge(usernames, on=["key", "id"], how="left", indicator=True)
+    display_names = display_names[display_names["_merge"] == "left_only"].drop(columns="_merge")
+
+    return usernames, display_names
+
+
+def _match_tier(pending, keys):
+    """Match pending entries against one key tier; returns (resolved, ambiguous, unmatched)"""
+    counts = keys.groupby("key")["id"].agg(["first", "size"]).reset_index()
+    # Nullable ints keep 64-bit IDs exact through the left join
+    counts = counts.astype({"first": "Int64"})
+    matched = pending.merge(counts, on="key", how="left", indicator=True)
+
+    resolved = matched[matched["size"] == 1].rename(columns={"first": "user_id"})
+    ambiguous = matched[matched["size"] > 1]
+    unmatched = matched[matched["_merge"] == "left_only"][pending.columns]
+    return resolved, ambiguous, unmatched
+
+
+def safety_reasons(members, bot_user_id):
+    """Why each snapshot row may not be removed, or None - the SAFETY CHECKS
+
+    Applied as masks in order of precedence, the last matching one wins.
+    """
+    reason = pd.Series(None, index=members.index, dtype=object)
+    for mask, message in [
+        (members["admin"], "Cannot remove administrators"),
+        (members["owner"], "Cannot remove server owner"),
+        (members["bot"], "Cannot remove bots"),
+        (members["id"] == bot_user_id, "Cannot remove bot"),
+    ]:
+        reason[mask.astype(bool)] = message
+    return reason
+
+
+def plan_targets(snapshot, entries, bot_user_id):
+    """Resolve uploaded entries against a member snapshot - WITH SAFETY CHECKS
+
+    Matching, de-duplication and the safety filter run as vectorized joins
+    and masks. Returns a plan DataFrame with ``entry``, ``user_id`` (missing
+    when unresolved), ``name``, ``discriminator`` and ``reason``, which is ``None`` for members
+    to act on. Each member is acted on once, under the first entry naming
+    it; later entries naming the same member are rejected as duplicates, so
+    every entry still gets an outcome.
+    """
+    frame = pd.DataFrame({"entry": pd.Series(list(entries), dtype=object)})
+    frame["order"] = range(len(frame))
+    is_id = frame["entry"].map(is_user_id).astype(bool)
+
+    # User IDs join directly on the member ID
+    by_id = frame[is_id].assign(user_id=lambda df: df["entry"].astype("int64"))
+    by_id = by_id.merge(snapshot[["id"]], left_on="user_id", right_on="id", how="left", indicator=True)
+    resolved = [by_id[by_id["_merge"] == "both"][["entry", "order", "user_id"]].astype({"user_id": "Int64"})]
+    rejected = [by_id[by_id["_merge"] == "left_only"][["entry", "order"]].assign(reason="User not found")]
+
+    # Usernames resolve before the non-unique global / display names; ID-only runs skip the name keys
+    pending = frame[~is_id].assign(key=lambda df: df["entry"].astype(str).str.strip().str.casefold())
+    if len(pending):
+        for keys in _name_keys(snapshot):
+            tier_resolved, tier_ambiguous, pending = _match_tier(pending, keys)
+            resolved.append(tier_resolved[["entry", "order", "user_id"]].astype({"user_id": "Int64"}))
+            rejected.append(tier_ambiguous[["entry", "order"]].assign(
+                reason=tier_ambiguous["size"].map(lambda n: f"Ambiguous: matches {int(n)} members")
+            ))
+        rejected.append(pending[["entry", "order"]].assign(reason="User not found"))
+
+    # De-duplicate on the member, keeping the first entry that named it
+    resolved = pd.concat(resolved, ignore_index=True).sort_values("order")
+    duplicate = resolved.duplicated("user_id")
+    first_entries = resolved[~duplicate].set_index("user_id")["entry"]
+    duplicates = resolved[duplicate]
+    rejected.append(duplicates[["entry", "order", "user_id"]].assign(
+        reason=duplicates["user_id"].map(first_entries).map(lambda entry: f"Duplicate of {entry}")
+    ))
+    resolved = resolved[~duplicate]
+    resolved = resolved.merge(snapshot.astype({"id": "Int64"}), left_on="user_id", right_on="id", how="left")
+
+    resolved["reason"] = safety_reasons(resolved, bot_user_id)
+
+    plan = pd.concat([resolved[["entry", "order", "user_id", "name", "discriminator", "reason"]]] + rejected, ignore_index=True)
+    plan = plan.sort_values("order").drop(columns="order").reset_index(drop=True)
+    plan["user_id"] = plan["user_id"].astype("Int64")
+    plan["reason"] = plan["reason"].astype(object).where(plan["reason"].notna(), None)
+    return plan
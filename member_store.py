@@ -0,0 +1,193 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from member_snapshot import SNAPSHOT_COLUMNS
+from role_index import admin_role_ids
+
+MEMBER_DB_PATH = os.getenv("DISCORD_MEMBER_DB", "members.sqlite3")
+
+# Snapshots older than this (seconds) are refreshed by re-chunking the guild
+SNAPSHOT_MAX_AGE = int(os.getenv("DISCORD_SNAPSHOT_MAX_AGE", 6 * 60 * 60))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS members (
+    guild_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    discriminator TEXT,
+    global_name TEXT,
+    display_name TEXT NOT NULL,
+    role_ids TEXT NOT NULL,
+    bot INTEGER NOT NULL,
+    joined_at REAL,
+    pending INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, id)
+);
+CREATE TABLE IF NOT EXISTS member_refresh (
+    guild_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    discriminator TEXT,
+    global_name TEXT,
+    display_name TEXT NOT NULL,
+    role_ids TEXT NOT NULL,
+    bot INTEGER NOT NULL,
+    joined_at REAL,
+    pending INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, id)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    guild_id INTEGER PRIMARY KEY,
+    refreshed_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _member_row(member):
+    # @everyone shares the guild's ID and is implied, so it is not stored
+    role_ids = ",".join(str(role.id) for role in member.roles if role.id != member.guild.id)
+    return (
+        member.guild.id,
+        member.id,
+        member.name,
+        getattr(member, "discriminator", "0"),
+        getattr(member, "global_name", None),
+        member.display_name,
+        role_ids,
+        int(member.bot),
+        member.joined_at.timestamp() if member.joined_at else None,
+        int(bool(getattr(member, "pending", False)))
+    )
+
+
+class MemberStore:
+    """SQLite copy of guild member lists, kept current from gateway events
+
+    A full refresh stores every member and stamps ``refreshed_at``; join,
+    update and remove events then patch single rows, so scans and name
+    resolution can read the local copy instead of re-chunking the guild.
+    """
+
+    def __init__(self, path=MEMBER_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        # Databases created before membership screening was tracked lack the column
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(members)")}
+        if "pending" not in columns:
+            with self._db:
+                self._db.execute("ALTER TABLE members ADD COLUMN pending INTEGER NOT NULL DEFAULT 0")
+
+    def replace_guild(self, guild):
+        """Store a full member list for the guild"""
+        rows = [_member_row(member) for member in guild.members]
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM members WHERE guild_id = ?", (guild.id,))
+            self._db.executemany("INSERT INTO members VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (guild.id, now, now))
+        logging.info(f"Stored member snapshot of {len(rows)} members for guild {guild.id}")
+
+    def begin_refresh(self, guild_id):
+        """Start a paged refresh, discarding pages left over from an interrupted one"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM member_refresh WHERE guild_id = ?", (guild_id,))
+
+    def stage_members(self, members):
+        """Add one page of a paged refresh; the stored snapshot is unchanged until ``finish_refresh``"""
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR REPLACE INTO member_refresh VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                 (_member_row(member) for member in members))
+
+    def finish_refresh(self, guild_id):
+        """Replace the guild's stored members with the staged pages"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM members WHERE guild_id = ?", (guild_id,))
+            count = self._db.execute(
+                "INSERT INTO members SELECT * FROM member_refresh WHERE guild_id = ?", (guild_id,)
+            ).rowcount
+            self._db.execute("DELETE FROM member_refresh WHERE guild_id = ?", (guild_id,))
+            self._db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)", (guild_id, now, now))
+        logging.info(f"Stored member snapshot of {count} members for guild {guild_id}")
+
+    def _touch(self, guild_id):
+        self._db.execute("UPDATE snapshots SET updated_at = ? WHERE guild_id = ?", (time.time(), guild_id))
+
+    def upsert_member(self, member):
+        """Apply a join or update event"""
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO members VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _member_row(member))
+            self._touch(member.guild.id)
+
+    def remove_member(self, guild_id, user_id):
+        """Apply a leave, kick or ban event"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM members WHERE guild_id = ? AND id = ?", (guild_id, user_id))
+            self._touch(guild_id)
+
+    def update_user(self, user):
+        """Apply a username / global name change in every guild"""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE members SET name = ?, discriminator = ?, global_name = ? WHERE id = ?",
+                (user.name, getattr(user, "discriminator", "0"), getattr(user, "global_name", None), user.id)
+            )
+
+    def refreshed_at(self, guild_id):
+        """Time of the last full refresh, or None if the guild was never stored"""
+        with self._lock:
+            row = self._db.execute("SELECT refreshed_at FROM snapshots WHERE guild_id = ?", (guild_id,)).fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self, guild_id, max_age=SNAPSHOT_MAX_AGE):
+        refreshed_at = self.refreshed_at(guild_id)
+        return refreshed_at is not None and time.time() - refreshed_at <= max_age
+
+    def load_snapshot(self, guild):
+        """Read the stored members as a snapshot DataFrame
+
+        Admin and owner flags are derived from the guild's current roles, so
+        permission changes since the refresh are respected.
+        """
+        with self._lock:
+            snapshot = pd.read_sql_query(
+                "SELECT id, name, discriminator, global_name, display_name, role_ids, bot, joined_at, pending "
+                "FROM members WHERE guild_id = ?",
+                self._db,
+                params=(guild.id,)
+            )
+
+        # Roles deleted since the refresh no longer count
+        exploded = snapshot["role_ids"].str.split(",").explode()
+        current_roles = {str(role.id) for role in guild.roles}
+        current = exploded[exploded.isin(current_roles)].astype("int64")
+        role_ids = current.groupby(level=0).agg(tuple)
+        snapshot["role_ids"] = [role_ids.get(index, ()) for index in snapshot.index]
+        snapshot["role_count"] = snapshot["role_ids"].map(len).astype("int64")
+
+        admin_roles = {str(role_id) for role_id in admin_role_ids(guild)}
+        if guild.default_role.permissions.administrator:
+            snapshot["admin"] = True
+        elif admin_roles:
+            snapshot["admin"] = exploded.isin(admin_roles).groupby(level=0).any()
+        else:
+            snapshot["admin"] = False
+
+        snapshot["owner"] = snapshot["id"] == guild.owner_id
+        snapshot["admin"] = snapshot["admin"] | snapshot["owner"]
+        snapshot["bot"] = snapshot["bot"].astype(bool)
+        snapshot["pending"] = snapshot["pending"].astype(bool)
+        snapshot["joined_at"] = pd.to_datetime(snapshot["joined_at"], unit="s", utc=True)
+        return snapshot[SNAPSHOT_COLUMNS]
@@ -0,0 +1,271 @@
+import bisect
+import copy
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus text file rewritten after each run, when set
+METRICS_FILE = os.getenv("DISCORD_METRICS_FILE")
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WAIT_BUCKETS = (0.0, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PHASE_BUCKETS = (0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+# Responses discord.py retries itself, so each one costs another request
+RETRIED_STATUSES = {429, 500, 502, 504, 524}
+
+_PREFIX = "discord_remover"
+
+
+class Histogram:
+    """Fixed-bucket histogram with Prometheus semantics
+
+    ``counts[i]`` holds observations up to ``bounds[i]``; the last slot is
+    the +Inf bucket. Counts are per bucket, not cumulative.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating within its bucket, as ``histogram_quantile`` does"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if index == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+    def since(self, earlier):
+        """Observations made after ``earlier``, a previous copy of this histogram"""
+        delta = Histogram(self.bounds)
+        if earlier is None:
+            earlier = delta
+        delta.counts = [now - before for now, before in zip(self.counts, earlier.counts)]
+        delta.count = self.count - earlier.count
+        delta.total = self.total - earlier.total
+        return delta
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class Metrics:
+    """Thread-safe counters and histograms for the kick/ban/lookup path
+
+    The rate-limit tracker records every HTTP request's latency and status
+    and every bucket wait; callers time phases such as member chunking, and
+    the action executor counts processed users. ``snapshot`` and ``since``
+    give the breakdown of a single run; ``to_prometheus`` renders totals in
+    the Prometheus text format.
+    """
+
+    def __init__(self):
+        self.requests = {}
+        self.bucket_waits = {}
+        self.phases = {}
+        self.responses = Counter()
+        self.rate_limited = 0
+        self.retried = 0
+        self.users = Counter()
+        self.action_seconds = 0.0
+        self.users_per_second = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _histogram(histograms, key, bounds):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(bounds)
+        return histogram
+
+    def observe_request(self, route, status, seconds):
+        """Record one HTTP request; ``status`` is ``None`` if it raised"""
+        with self._lock:
+            self._histogram(self.requests, route, LATENCY_BUCKETS).observe(seconds)
+            self.responses[(route, status or "error")] += 1
+            if status == 429:
+                self.rate_limited += 1
+            if status is None or status in RETRIED_STATUSES:
+                self.retried += 1
+
+    def observe_bucket_wait(self, route, seconds):
+        with self._lock:
+            self._histogram(self.bucket_waits, route, WAIT_BUCKETS).observe(seconds)
+
+    def observe_phase(self, phase, seconds):
+        with self._lock:
+            self._histogram(self.phases, phase, PHASE_BUCKETS).observe(seconds)
+
+    @contextmanager
+    def timed(self, phase):
+        """Time the enclosed block as one observation of ``phase``"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_phase(phase, time.perf_counter() - started)
+
+    def record_user(self, action, outcome):
+        with self._lock:
+            self.users[(action, outcome)] += 1
+
+    def record_run(self, processed, seconds):
+        """Close an action run: adds its duration and sets the users/sec gauge"""
+        with self._lock:
+            self.action_seconds += seconds
+            self.users_per_second = processed / seconds if seconds > 0 else 0.0
+
+    def snapshot(self):
+        """Consistent copy of every metric"""
+        with self._lock:
+            copied = copy.copy(self)
+            copied.requests = copy.deepcopy(self.requests)
+            copied.bucket_waits = copy.deepcopy(self.bucket_waits)
+            copied.phases = copy.deepcopy(self.phases)
+            copied.responses = Counter(self.responses)
+            copied.users = Counter(self.users)
+            copied._lock = threading.Lock()
+        return copied
+
+    def since(self, earlier):
+        """Metrics recorded after ``earlier``, a previous ``snapshot``"""
+        current = self.snapshot()
+        delta = Metrics()
+        for name in ("requests", "bucket_waits", "phases"):
+            before = getattr(earlier, name)
+            setattr(delta, name, {
+                key: histogram.since(before.get(key))
+                for key, histogram in getattr(current, name).items()
+                if histogram.count > (before[key].count if key in before else 0)
+            })
+        delta.responses = current.responses - earlier.responses
+        delta.users = current.users - earlier.users
+        delta.rate_limited = current.rate_limited - earlier.rate_limited
+        delta.retried = current.retried - earlier.retried
+        delta.action_seconds = current.action_seconds - earlier.action_seconds
+        delta.users_per_second = current.users_per_second
+        return delta
+
+    def route_rows(self):
+        """Per-route request count, latency percentiles and bucket waits, for display"""
+        with self._lock:
+            rows = []
+            for route, histogram in sorted(self.requests.items()):
+                waits = self.bucket_waits.get(route)
+                rows.append({
+                    "Route": route,
+                    "Requests": histogram.count,
+                    "p50 ms": round(histogram.quantile(0.5) * 1000, 1),
+                    "p99 ms": round(histogram.quantile(0.99) * 1000, 1),
+                    "Request s": round(histogram.total, 2),
+                    "Bucket wait s": round(waits.total, 2) if waits else 0.0,
+                })
+            return rows
+
+    def to_prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        current = self.snapshot()
+        lines = []
+
+        def histograms(name, help_text, label, items):
+            lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {_PREFIX}_{name} histogram")
+            for key, histogram in sorted(items.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.bounds + ("+Inf",), histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{_PREFIX}_{name}_bucket{_labels(**{label: key, 'le': bound})} {cumulative}")
+                lines.append(f"{_PREFIX}_{name}_sum{_labels(**{label: key})} {histogram.total}")
+                lines.append(f"{_PREFIX}_{name}_count{_labels(**{label: key})} {histogram.count}")
+
+        def scalar(name, kind, help_text, samples):
+            lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{_PREFIX}_{name}{_labels(**labels) if labels else ''} {value}")
+
+        histograms("request_duration_seconds", "Discord HTTP request latency by route", "route", current.requests)
+        histograms("bucket_wait_seconds", "Time spent waiting for a rate-limit bucket by route", "route", current.bucket_waits)
+        histograms("phase_duration_seconds", "Duration of member chunking, lookups and name resolution", "phase", current.phases)
+        scalar("responses_total", "counter", "Discord HTTP responses by route and status",
+               [({"route": route, "status": status}, count) for (route, status), count in sorted(current.responses.items(), key=str)])
+        scalar("rate_limited_total", "counter", "Discord 429 responses", [(None, current.rate_limited)])
+        scalar("retried_requests_total", "counter", "Requests discord.py retried after a 429, 5xx or connection error",
+               [(None, current.retried)])
+        scalar("users_total", "counter", "Users processed by action and outcome",
+               [({"action": action, "outcome": outcome}, count) for (action, outcome), count in sorted(current.users.items())])
+        scalar("action_seconds_total", "counter", "Time spent running kick/ban actions", [(None, current.action_seconds)])
+        scalar("users_per_second", "gauge", "Throughput of the most recent run", [(None, current.users_per_second)])
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path=None):
+        """Atomically rewrite the Prometheus text file at ``path`` (default ``METRICS_FILE``)"""
+        path = path or METRICS_FILE
+        if not path:
+            return
+        temporary = f"{path}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(temporary, path)
+        except OSError as e:
+            logging.error(f"Could not write metrics to {path}: {str(e)}")
+
+
+# Shared by every tracker and session in the process
+process_metrics = Metrics()
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def start_metrics_server(port, metrics=process_metrics):
+    """Serve ``metrics`` at ``http://0.0.0.0:<port>/metrics``, once per port"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _servers_lock:
+        if port not in _servers:
+            server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            _servers[port] = server
+            logging.info(f"Serving metrics on port {port}")
+        return _servers[port]
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# Recent events kept for readers that fall behind; totals never depend on them
+MAX_RECENT_EVENTS = 1000
+
+ProgressEvent = namedtuple(
+    "ProgressEvent",
+    ["seq", "entry", "outcome", "detail", "processed", "total", "rate", "eta", "rate_limited", "timestamp"]
+)
+
+
+class ProgressChannel:
+    """Thread-safe stream of per-item progress events for one run
+
+    The worker publishes an event per processed item; readers block in
+    ``wait`` until a new event arrives or the run closes, so progress is
+    rendered as it happens instead of on a polling interval.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.processed = 0
+        self.status = None
+        self.started_at = None
+        self._rate_limits = None
+        self._rate_limited_base = 0
+        self._seq = 0
+        self._recent = deque(maxlen=MAX_RECENT_EVENTS)
+        self._condition = threading.Condition()
+
+    def start(self, rate_limits=None):
+        """Start the clock; 429s are counted on ``rate_limits`` from here on"""
+        with self._condition:
+            self.started_at = time.time()
+            self._rate_limits = rate_limits
+            self._rate_limited_base = rate_limits.rate_limited_count if rate_limits else 0
+
+    def _rate_limited(self):
+        if self._rate_limits is None:
+            return 0
+        return self._rate_limits.rate_limited_count - self._rate_limited_base
+
+    def publish(self, entry, outcome, detail=None):
+        """Record one item's outcome and wake every waiting reader"""
+        with self._condition:
+            now = time.time()
+            if self.started_at is None:
+                self.started_at = now
+            self.processed += 1
+            self._seq += 1
+
+            elapsed = now - self.started_at
+            rate = self.processed / elapsed if elapsed > 0 else 0.0
+            remaining = max(self.total - self.processed, 0)
+            eta = remaining / rate if rate > 0 else None
+
+            event = ProgressEvent(
+                self._seq, entry, outcome, detail, self.processed, self.total,
+                rate, eta, self._rate_limited(), now
+            )
+            self._recent.append(event)
+            self._condition.notify_all()
+            return event
+
+    def close(self, status):
+        """Mark the run finished; waiting readers return immediately"""
+        with self._condition:
+            self.status = status
+            self._condition.notify_all()
+
+    @property
+    def closed(self):
+        return self.status is not None
+
+    @property
+    def latest(self):
+        with self._condition:
+            return self._recent[-1] if self._recent else None
+
+    def events(self, after=0):
+        """Recent events with a sequence number above ``after``"""
+        with self._condition:
+            return [event for event in self._recent if event.seq > after]
+
+    def wait(self, after=0, timeout=None):
+        """Block until an event newer than ``after`` exists or the run closes
+
+        Returns the new events, possibly empty on timeout or close.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > after or self.status is not None, timeout)
+            return [event for event in self._recent if event.seq > after]
@@ -0,0 +1,375 @@
+import asyncio
+import logging
+
+import discord
+import pandas as pd
+from discord.ext import commands
+
+from action_executor import ActionExecutor, RateLimitTracker, DEFAULT_MAX_IN_FLIGHT
+from bot_session import get_session
+from job_queue import CANCELLED, COMPLETED, FAILED
+from member_snapshot import build_member_snapshot, plan_targets, safety_reasons
+from role_index import NoRoleIndex
+from results import RESULTS_KEPT, ActionResult, Outcome, ResultLog, ResultWriter, results_prefix
+from run_journal import RunJournal
+from safety import is_user_id
+
+# Gateway member requests accept at most 100 user IDs
+MEMBER_QUERY_BATCH = 100
+
+
+class SnapshotMember(discord.Object):
+    """Member known only from a snapshot; enough to kick or ban by ID"""
+
+    def __init__(self, id, name, discriminator="0"):
+        super().__init__(id=id)
+        self.name = name
+        self.discriminator = discriminator
+
+
+class DiscordUserRemover:
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self.bot = None
+        self.is_connected = False
+        self.results = ResultLog()
+        self.max_in_flight = max_in_flight
+        self.rate_limits = RateLimitTracker()
+        self.run_metrics = None
+        
+    async def create_bot(self, token, guild_id, timeout=10):
+        """Create and connect Discord bot, waiting up to ``timeout`` seconds for it to be ready"""
+        try:
+            intents = discord.Intents.default()
+            intents.members = True
+            intents.guilds = True
+            
+            # Member lists are chunked on first use, so ID-only runs never wait for them
+            self.bot = commands.Bot(
+                command_prefix='!',
+                intents=intents,
+                http_trace=self.rate_limits.trace_config(),
+                chunk_guilds_at_startup=False
+            )
+            
+            @self.bot.event
+            async def on_ready():
+                logging.info(f'Bot connected as {self.bot.user}')
+                self.is_connected = True
+                
+            await self.bot.login(token)
+            # Keep the gateway running in the background; awaiting connect() would never return
+            self._connection = asyncio.create_task(self.bot.connect())
+            
+            # Wait for connection
+            while not self.is_connected and timeout > 0:
+                await asyncio.sleep(1)
+                timeout -= 1
+                
+            if not self.is_connected:
+                raise Exception("Failed to connect to Discord")
+                
+            return True
+            
+        except Exception as e:
+            logging.error(f"Failed to create bot: {str(e)}")
+            return False
+    
+    async def load_members(self, guild):
+        """Chunk the guild's member list into the cache, if it is not there yet"""
+        if not guild.chunked:
+            with self.rate_limits.metrics.timed("chunking"):
+                await guild.chunk()
+    
+    def attach(self, client, rate_limits=None):
+        """Use an already-connected client instead of creating a new bot"""
+        self.bot = client
+        self.is_connected = client.is_ready()
+        if rate_limits is not None:
+            self.rate_limits = rate_limits
+    
+    async def prune_users_without_roles(self, guild_id, days=30, dry_run=True, snapshot=None):
+        """Kick inactive users without roles with a single server-side prune - WITH SAFETY CHECKS
+        
+        Discord's prune only removes members that have no roles and have been
+        inactive for ``days``. Returns ``(success, count, message)``; with
+        ``dry_run`` the count is an estimate and nobody is removed. Bots are
+        checked against ``snapshot`` when given, otherwise the member cache.
+        """
+        if not self.bot or not self.is_connected:
+            return False, 0, "Bot not connected"
+        
+        try:
+            guild = self.bot.get_guild(int(guild_id))
+            if not guild:
+                return False, 0, f"Guild {guild_id} not found"
+            
+            days = max(1, min(30, int(days)))
+            
+            # SAFETY CHECK: If @everyone grants administrator, every role-less member is an admin
+            if guild.default_role.permissions.administrator:
+                return False, 0, "Prune refused: @everyone has administrator permission"
+            
+            # SAFETY CHECK: Prune does not skip bots, so refuse if any bot has no roles
+            if snapshot is not None:
+                unprotected_bots = snapshot.loc[snapshot["bot"] & (snapshot["role_count"] == 0), "name"].tolist()
+            elif guild.chunked:
+                unprotected_bots = [m.name for m in guild.members if m.bot and len(m.roles) <= 1]
+            else:
+                return False, 0, "Prune refused: member list not loaded, cannot verify bots are protected"
+            if unprotected_bots:
+                return False, 0, f"Prune refused: bots without roles would be removed ({', '.join(unprotected_bots[:5])})"
+            
+            # The owner can never be kicked, so prune leaves them untouched
+            estimate = await guild.estimate_pruned_members(days=days)
+            logging.info(f"Prune estimate for {days} days of inactivity: {estimate} users")
+            if dry_run:
+                return True, estimate, f"{estimate} users without roles inactive for {days}+ days would be pruned"
+            
+            pruned = await guild.prune_members(days=days, compute_prune_count=True, reason="Bulk removal via bot (prune)")
+            logging.info(f"Pruned {pruned} users without roles")
+            return True, pruned, f"Pruned {pruned} users without roles inactive for {days}+ days"
+            
+        except discord.Forbidden:
+            return False, 0, "Missing Kick Members permission for prune"
+        except Exception as e:
+            logging.error(f"Error pruning users without roles: {str(e)}")
+            return False, 0, str(e)
+    
+    async def get_users_without_roles(self, guild_id):
+        """Get list of users without any roles (except @everyone) - WITH SAFETY CHECKS"""
+        if not self.bot or not self.is_connected:
+            return []
+        
+        try:
+            guild = self.bot.get_guild(int(guild_id))
+            if not guild:
+                return []
+            await self.load_members(guild)
+            
+            # SAFETY CHECKS: bots, the owner and administrators are never indexed;
+            # admin status comes from per-role permission bits, not per-member resolution
+            index = NoRoleIndex()
+            index.rebuild_from_members(guild)
+            users_without_roles = index.names(guild.id)
+            
+            logging.info(f"Found {len(users_without_roles)} users without roles")
+            return users_without_roles
+            
+        except Exception as e:
+            logging.error(f"Error getting users without roles: {str(e)}")
+            return []
+    
+    async def fetch_members_by_id(self, guild, user_ids):
+        """Fetch only the targeted members, in batched gateway requests"""
+        members = {}
+        user_ids = list(dict.fromkeys(user_ids))
+        for start in range(0, len(user_ids), MEMBER_QUERY_BATCH):
+            batch = user_ids[start:start + MEMBER_QUERY_BATCH]
+            with self.rate_limits.metrics.timed("member_query"):
+                batch_members = await guild.query_members(user_ids=batch, limit=MEMBER_QUERY_BATCH, cache=False)
+            for member in batch_members:
+                members[member.id] = member
+        return members
+    
+    async def recheck_targets(self, guild, plan, members_by_id):
+        """Re-apply the safety checks to the planned targets' current members - WITH SAFETY CHECKS
+        
+        A stored snapshot misses role changes made while no session was
+        connected, so every target is fetched again in batched member
+        queries; targets that have left the guild are no longer found.
+        Fetched members are added to ``members_by_id``.
+        """
+        targets = plan["reason"].isna()
+        user_ids = plan.loc[targets, "user_id"].astype("int64")
+        members_by_id.update(await self.fetch_members_by_id(guild, user_ids.tolist()))
+        
+        current = build_member_snapshot(guild, [members_by_id[user_id] for user_id in user_ids if user_id in members_by_id])
+        current_reasons = pd.Series(safety_reasons(current, self.bot.user.id).to_numpy(), index=current["id"], dtype=object)
+        found = user_ids.isin(current["id"])
+        
+        plan = plan.copy()
+        plan.loc[user_ids.index[~found], "reason"] = "User not found"
+        plan.loc[user_ids.index[found], "reason"] = user_ids[found].map(current_reasons).to_numpy()
+        plan["reason"] = plan["reason"].where(plan["reason"].notna(), None)
+        changed = plan.loc[targets, "reason"].notna().sum()
+        if changed:
+            logging.warning(f"Rejected {changed} targets that changed since the stored member snapshot")
+        return plan
+    
+    async def resolve_targets(self, guild, entries, snapshot=None, verify=False):
+        """Resolve uploaded usernames and user IDs to members - WITH SAFETY CHECKS
+        
+        Returns ``(targets, rejected)`` as lists of ``(entry, member)`` and
+        ``(entry, user_id, reason)``, with ``user_id`` None when unresolved. Matching runs against a columnar member snapshot,
+        either the given ``snapshot`` or one built from the member cache.
+        Usernames need one of those, so without a snapshot the guild is
+        chunked first unless every entry is a user ID; ID-only runs fetch
+        their members directly and need no chunking. With
+        ``verify``, for a snapshot this session has not refreshed, the
+        targets are re-checked against their current members before acting.
+        """
+        entries = list(entries)
+        members_by_id = {}
+        if snapshot is not None:
+            pass
+        elif guild.chunked or not all(is_user_id(entry) for entry in entries):
+            await self.load_members(guild)
+            snapshot = build_member_snapshot(guild)
+        else:
+            user_ids = [entry for entry in entries if is_user_id(entry)]
+            members_by_id = await self.fetch_members_by_id(guild, user_ids) if user_ids else {}
+            snapshot = build_member_snapshot(guild, members_by_id.values())
+        
+        with self.rate_limits.metrics.timed("resolve"):
+            plan = plan_targets(snapshot, entries, self.bot.user.id)
+        if verify:
+            plan = await self.recheck_targets(guild, plan, members_by_id)
+        
+        targets = []
+        rejected = []
+        for entry, user_id, name, discriminator, reason in zip(
+            plan["entry"], plan["user_id"], plan["name"], plan["discriminator"], plan["reason"]
+        ):
+            if isinstance(reason, str):
+                rejected.append((entry, None if pd.isna(user_id) else int(user_id), reason))
+                if reason == "User not found":
+                    logging.warning(f"{reason}: {entry}")
+                continue
+            
+            user_id = int(user_id)
+            member = members_by_id.get(user_id) or guild.get_member(user_id)
+            if member is None:
+                # Known only from a stored snapshot; acting by ID needs no member object
+                member = SnapshotMember(user_id, name, discriminator)
+            targets.append((entry, member))
+        
+        return targets, rejected
+    
+    async def remove_users(self, usernames, guild_id, action_type="kick", bulk_ban=True, on_result=None):
+        """Remove users from Discord server
+        
+        ``usernames`` may mix usernames and integer user IDs. Bans go through
+        Discord's bulk-ban endpoint unless ``bulk_ban`` is False.
+        ``on_result(result)`` is called with every ``ActionResult`` as it
+        happens; the run's results are also kept in ``results`` and its
+        request metrics in ``run_metrics``.
+        """
+        if not self.bot or not self.is_connected:
+            return False, "Bot not connected"
+        
+        metrics_before = self.rate_limits.metrics.snapshot()
+        try:
+            guild = self.bot.get_guild(int(guild_id))
+            if not guild:
+                return False, f"Guild {guild_id} not found"
+            
+            self.results = ResultLog()
+            
+            def record_result(result):
+                self.results.append(result)
+                if result.outcome is Outcome.FAILED:
+                    logging.error(f"Failed to remove {result.entry}: {result.error}")
+                if on_result:
+                    on_result(result)
+            
+            targets, rejected = await self.resolve_targets(guild, usernames)
+            for username, user_id, reason in rejected:
+                record_result(ActionResult(username, user_id, Outcome.REJECTED, reason))
+            
+            # Rate-limit-aware concurrent execution replaces the fixed per-user delay
+            executor = ActionExecutor(
+                guild,
+                action_type,
+                max_in_flight=self.max_in_flight,
+                tracker=self.rate_limits,
+                bulk_ban=bulk_ban
+            )
+            await executor.run(targets, record_result)
+            
+            return True, f"Process completed. Removed: {self.results.removed}, Failed: {self.results.failed}"
+            
+        except Exception as e:
+            logging.error(f"Error in remove_users: {str(e)}")
+            return False, str(e)
+        finally:
+            self.run_metrics = self.rate_limits.metrics.since(metrics_before)
+            self.rate_limits.metrics.write_file()
+    
+    async def disconnect(self):
+        """Disconnect bot"""
+        if self.bot:
+            await self.bot.close()
+            self.is_connected = False
+
+def run_removal_job(job):
+    """Job queue runner: resolve and remove the job's users on the shared bot session
+    
+    Every outcome is checkpointed to the run journal at ``options["journal_path"]``
+    and streamed to result files beside it, and the run's request metrics are
+    left in ``job.metrics``.
+    """
+    options = job.options
+    session = get_session(options["bot_token"])
+    journal = RunJournal(options["journal_path"])
+    job.results = ResultLog(ResultWriter(results_prefix(journal.path)), keep=RESULTS_KEPT)
+    metrics_before = session.rate_limits.metrics.snapshot()
+    
+    async def discord_bot_operations(client):
+        # ID-only runs fetch their targets directly; name runs read the stored member snapshot
+        ids_only = all(is_user_id(entry) for entry in job.entries)
+        if ids_only:
+            guild, snapshot = await session.get_guild(options["guild_id"]), None
+        else:
+            guild, snapshot = await session.member_snapshot(options["guild_id"])
+        if not guild:
+            raise Exception("Server not found")
+        
+        # Resolve and safety-check every user before acting
+        remover = DiscordUserRemover()
+        remover.attach(client, session.rate_limits)
+        targets, rejected = await remover.resolve_targets(
+            guild, job.entries, snapshot, verify=snapshot is not None and not session.is_verified(guild.id)
+        )
+        job.progress.start(session.rate_limits)
+        
+        def record_result(result):
+            job.results.append(result)
+            journal.record(result.entry, result.outcome.journal_outcome, result.error)
+            job.progress.publish(result.entry, result.outcome.journal_outcome, result.error)
+        
+        for username, user_id, reason in rejected:
+            record_result(ActionResult(username, user_id, Outcome.REJECTED, reason))
+        
+        def record_not_attempted(targets):
+            for username, member in targets:
+                result = ActionResult(username, member.id, Outcome.NOT_ATTEMPTED)
+                job.results.append(result)
+                journal.record(username, result.outcome.journal_outcome)
+        
+        if job.cancel_requested:
+            record_not_attempted(targets)
+            return
+        
+        # Perform actions with rate-limit-aware concurrency
+        executor = ActionExecutor(
+            guild,
+            options["action_type"],
+            max_in_flight=options["max_in_flight"],
+            tracker=session.rate_limits,
+            delete_message_days=0,
+            bulk_ban=options["bulk_ban"],
+            cancel_token=job.cancel_token
+        )
+        not_attempted = await executor.run(targets, record_result)
+        record_not_attempted(not_attempted)
+    
+    try:
+        session.run(discord_bot_operations)
+    except Exception:
+        journal.finish(FAILED)
+        raise
+    finally:
+        job.results.writer.close()
+        job.metrics = session.rate_limits.metrics.since(metrics_before)
+        session.rate_limits.metrics.write_file()
+    journal.finish(CANCELLED if job.cancel_requested else COMPLETED)
@@ -0,0 +1,315 @@
+import csv
+import enum
+import glob
+import io
+import logging
+import os
+import threading
+import time
+import zipfile
+from collections import Counter, deque
+from datetime import datetime, timezone
+
+import run_journal
+
+# Streaming results export: file format, rows per part file, and how often buffered rows are written
+RESULTS_FORMAT = os.getenv("DISCORD_RESULTS_FORMAT", "csv")
+RESULTS_FORMATS = ["csv", "parquet"]
+RESULTS_ROTATE_ROWS = int(os.getenv("DISCORD_RESULTS_ROTATE_ROWS", 100_000))
+FLUSH_ROWS = 1000
+FLUSH_INTERVAL = 1.0
+
+# Records a streamed run keeps in memory for display; the files hold all of them
+RESULTS_KEPT = int(os.getenv("DISCORD_RESULTS_KEPT", 10_000))
+
+
+class Outcome(enum.Enum):
+    REMOVED = "removed"
+    # Sent to Discord and refused, or the request failed
+    FAILED = "failed"
+    # Never sent: not found, ambiguous, or refused by a safety check
+    REJECTED = "rejected"
+    # Never sent because the run was cancelled
+    NOT_ATTEMPTED = "not_attempted"
+
+    @property
+    def journal_outcome(self):
+        """The run journal's outcome for this result"""
+        if self is Outcome.REMOVED:
+            return run_journal.REMOVED
+        if self is Outcome.NOT_ATTEMPTED:
+            return run_journal.NOT_ATTEMPTED
+        return run_journal.FAILED
+
+
+RESULT_COLUMNS = ["timestamp", "entry", "user_id", "outcome", "error", "code", "status", "latency"]
+
+
+class ActionResult:
+    """Outcome of one target of a run
+
+    ``entry`` is the input key (username or ID as uploaded) and ``user_id``
+    the resolved member, if any. ``code`` and ``status`` are Discord's JSON
+    error code and the HTTP status of the action request; ``latency`` is
+    that request's duration in seconds. All three are ``None`` when no
+    request was sent.
+    """
+
+    __slots__ = ("timestamp", "entry", "user_id", "outcome", "error", "code", "status", "latency")
+
+    def __init__(self, entry, user_id, outcome, error=None, code=None, status=None, latency=None, timestamp=None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.entry = entry
+        self.user_id = user_id
+        self.outcome = outcome
+        self.error = error
+        self.code = code
+        self.status = status
+        self.latency = latency
+
+    @property
+    def ok(self):
+        return self.outcome is Outcome.REMOVED
+
+    def to_dict(self):
+        record = {column: getattr(self, column) for column in RESULT_COLUMNS}
+        record["outcome"] = self.outcome.value
+        return record
+
+    def __repr__(self):
+        return f"ActionResult({self.entry!r}, {self.user_id}, {self.outcome.value}" + (f", {self.error!r})" if self.error else ")")
+
+
+class ResultLog:
+    """Append-only log of a run's ``ActionResult`` records with running counts
+
+    Appended to from the bot loop while other threads read the counts, so
+    statistics never scan the records; exports read the fields directly.
+    With a ``writer`` every record is also streamed to disk, and only the
+    latest ``keep`` records stay in memory.
+    """
+
+    def __init__(self, writer=None, keep=None):
+        self.records = deque(maxlen=keep) if keep else []
+        self.counts = Counter()
+        self.writer = writer
+
+    def append(self, result):
+        self.records.append(result)
+        self.counts[result.outcome] += 1
+        if self.writer:
+            self.writer.append(result)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @property
+    def removed(self):
+        return self.counts[Outcome.REMOVED]
+
+    @property
+    def failed(self):
+        return self.counts[Outcome.FAILED] + self.counts[Outcome.REJECTED]
+
+    @property
+    def not_attempted(self):
+        return self.counts[Outcome.NOT_ATTEMPTED]
+
+    @property
+    def processed(self):
+        return self.removed + self.failed
+
+    def columns(self, *outcomes, fields=RESULT_COLUMNS):
+        """The records' ``fields`` as a dict of column lists, only ``outcomes`` if given"""
+        records = [record for record in self.records if record.outcome in outcomes] if outcomes else list(self.records)
+        columns = {field: [getattr(record, field) for record in records] for field in fields}
+        if "outcome" in columns:
+            columns["outcome"] = [outcome.value for outcome in columns["outcome"]]
+        return columns
+
+    def to_frame(self, *outcomes):
+        """Records as a DataFrame, with timestamps as UTC datetimes"""
+        import pandas as pd
+
+        frame = pd.DataFrame(self.columns(*outcomes), columns=RESULT_COLUMNS)
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], unit="s", utc=True)
+        frame["user_id"] = frame["user_id"].astype("Int64")
+        frame["code"] = frame["code"].astype("Int64")
+        frame["status"] = frame["status"].astype("Int64")
+        return frame
+
+
+def results_prefix(journal_path):
+    """Path prefix of the result files streamed for a journaled run"""
+    return os.path.splitext(journal_path)[0] + ".results"
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat(sep=" ")
+
+
+class ResultWriter:
+    """Streams ``ActionResult`` records to rotating CSV or Parquet files during a run
+
+    ``append`` only buffers, so it is cheap enough to call from the bot
+    loop; a background thread writes the buffer every ``flush_rows`` records
+    or ``flush_interval`` seconds, and a new part file is started every
+    ``rotate_rows`` rows. CSV parts are readable after every flush, so a
+    crash loses at most the unwritten batch; a Parquet part becomes readable
+    once it is rotated, exported or closed. Parts from an earlier attempt of
+    the same run are kept, and new ones numbered after them.
+    """
+
+    def __init__(self, prefix, format=RESULTS_FORMAT, rotate_rows=RESULTS_ROTATE_ROWS,
+                 flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL):
+        if format not in RESULTS_FORMATS:
+            raise ValueError(f"Unknown results format {format!r}, expected one of {', '.join(RESULTS_FORMATS)}")
+        self.prefix = prefix
+        self.format = format
+        self.rotate_rows = max(1, int(rotate_rows))
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.paths = sorted(glob.glob(glob.escape(prefix) + f".*.{format}"))
+        self.rows = 0
+        self._part = None
+        self._part_rows = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+
+    def append(self, result):
+        with self._lock:
+            self._pending.append(result)
+            if len(self._pending) >= self.flush_rows:
+                self._wake.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Could not write results to {self.prefix}: {str(e)}")
+
+    def flush(self):
+        """Write every buffered record now"""
+        with self._write_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            while batch:
+                if self._part is None or self._part_rows >= self.rotate_rows:
+                    self._rotate()
+                rows, batch = batch[:self.rotate_rows - self._part_rows], batch[self.rotate_rows - self._part_rows:]
+                self._write(rows)
+                self._part_rows += len(rows)
+                self.rows += len(rows)
+
+    def _rotate(self):
+        self._close_part()
+        path = f"{self.prefix}.{len(self.paths) + 1:04d}.{self.format}"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self.format == "csv":
+            self._part = open(path, "w", encoding="utf-8", newline="")
+            csv.writer(self._part).writerow(RESULT_COLUMNS)
+        else:
+            import pyarrow.parquet as pq
+
+            self._part = pq.ParquetWriter(path, _parquet_schema())
+        self.paths.append(path)
+        self._part_rows = 0
+
+    def _write(self, rows):
+        if self.format == "csv":
+            csv.writer(self._part).writerows(
+                (_timestamp(r.timestamp), r.entry, r.user_id, r.outcome.value, r.error, r.code, r.status, r.latency)
+                for r in rows
+            )
+            self._part.flush()
+        else:
+            import pyarrow as pa
+
+            # Each batch becomes one row group
+            self._part.write_table(pa.table({
+                "timestamp": [int(r.timestamp * 1_000_000) for r in rows],
+                "entry": [str(r.entry) for r in rows],
+                "user_id": [r.user_id for r in rows],
+                "outcome": [r.outcome.value for r in rows],
+                "error": [r.error for r in rows],
+                "code": [r.code for r in rows],
+                "status": [r.status for r in rows],
+                "latency": [r.latency for r in rows],
+            }, schema=_parquet_schema()))
+
+    def _close_part(self):
+        if self._part is not None:
+            self._part.close()
+            self._part = None
+
+    def close(self):
+        """Write the remaining records and close the current part"""
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        with self._write_lock:
+            self._close_part()
+
+    @property
+    def file_name(self):
+        """Download name of ``export``"""
+        name = os.path.basename(self.prefix)
+        return f"{name}.csv" if self.format == "csv" else f"{name}.parquet.zip"
+
+    @property
+    def mime(self):
+        return "text/csv" if self.format == "csv" else "application/zip"
+
+    def export(self):
+        """The results written so far as one download, copied from the part files
+
+        CSV parts are joined under a single header; Parquet parts are zipped
+        as they are, after the open part is finished so that it is readable.
+        """
+        self.flush()
+        output = io.BytesIO()
+        # Holding the write lock keeps a half-written batch out of the copy; appends never wait on it
+        with self._write_lock:
+            if self.format == "csv":
+                for index, path in enumerate(self.paths):
+                    with open(path, "rb") as f:
+                        if index:
+                            f.readline()
+                        output.write(f.read())
+            else:
+                self._close_part()
+                with zipfile.ZipFile(output, "w", zipfile.ZIP_STORED) as archive:
+                    for path in self.paths:
+                        archive.write(path, os.path.basename(path))
+        return output.getvalue()
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("entry", pa.string()),
+        ("user_id", pa.int64()),
+        ("outcome", pa.string()),
+        ("error", pa.string()),
+        ("code", pa.int32()),
+        ("status", pa.int16()),
+        ("latency", pa.float64()),
+    ])
@@ -0,0 +1,118 @@
+import logging
+import threading
+
+import discord
+
+from member_filters import users_without_roles
+
+# Permission bit of the Administrator permission
+ADMINISTRATOR = discord.Permissions.administrator.flag
+
+
+def admin_role_ids(guild):
+    """IDs of the guild's roles that grant Administrator, from each role's permission bits"""
+    return {role.id for role in guild.roles if role.permissions.value & ADMINISTRATOR}
+
+
+class NoRoleIndex:
+    """Live set of role-less, non-protected members per guild - WITH SAFETY CHECKS
+
+    Bots, the server owner and administrators are never indexed. Member
+    events patch single entries; role and guild events that change who is
+    protected trigger a rebuild from the member snapshot. Counting is O(1).
+    """
+
+    def __init__(self):
+        self._members = {}
+        self._admin_roles = {}
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def is_built(self, guild_id):
+        return guild_id in self._members
+
+    def rebuild(self, guild, snapshot):
+        """Replace the guild's index with the role-less members of a snapshot"""
+        rows = users_without_roles(snapshot)
+        members = dict(zip(rows["id"].tolist(), rows["name"].tolist()))
+        with self._lock:
+            self._members[guild.id] = members
+            self._admin_roles[guild.id] = admin_role_ids(guild)
+            self._owners[guild.id] = guild.owner_id
+        logging.info(f"Indexed {len(members)} users without roles in guild {guild.id}")
+
+    def rebuild_from_members(self, guild):
+        """Replace the guild's index by scanning the member cache"""
+        with self._lock:
+            self._members[guild.id] = {}
+            self._admin_roles[guild.id] = admin_role_ids(guild)
+            self._owners[guild.id] = guild.owner_id
+        for member in guild.members:
+            self.apply_member(member)
+
+    def _is_candidate(self, member):
+        guild_id = member.guild.id
+        # SAFETY CHECK: Skip bots and the server owner
+        if member.bot or member.id == self._owners.get(guild_id):
+            return False
+
+        # Any role besides @everyone (which shares the guild's ID) disqualifies
+        role_ids = [role.id for role in member.roles if role.id != guild_id]
+        if role_ids:
+            return False
+
+        # SAFETY CHECK: A role-less member is an administrator only through @everyone
+        return guild_id not in self._admin_roles[guild_id]
+
+    def apply_member(self, member):
+        """Apply a join or update event"""
+        guild_id = member.guild.id
+        if guild_id not in self._members:
+            return
+        with self._lock:
+            if self._is_candidate(member):
+                self._members[guild_id][member.id] = member.name
+            else:
+                self._members[guild_id].pop(member.id, None)
+
+    def remove_member(self, guild_id, user_id):
+        """Apply a leave, kick or ban event"""
+        with self._lock:
+            if guild_id in self._members:
+                self._members[guild_id].pop(user_id, None)
+
+    def rename_user(self, user):
+        """Apply a username change in every guild"""
+        with self._lock:
+            for members in self._members.values():
+                if user.id in members:
+                    members[user.id] = user.name
+
+    def needs_rebuild(self, guild):
+        """Whether a role or guild change altered who is protected
+
+        Updates the stored admin role bits; a change to @everyone's
+        Administrator bit or to the owner invalidates every entry.
+        """
+        if guild.id not in self._members:
+            return False
+        with self._lock:
+            admin_roles = admin_role_ids(guild)
+            everyone_changed = (guild.id in admin_roles) != (guild.id in self._admin_roles[guild.id])
+            owner_changed = guild.owner_id != self._owners[guild.id]
+            self._admin_roles[guild.id] = admin_roles
+            self._owners[guild.id] = guild.owner_id
+        return everyone_changed or owner_changed
+
+    def count(self, guild_id):
+        return len(self._members.get(guild_id, ()))
+
+    def names(self, guild_id):
+        with self._lock:
+            return list(self._members.get(guild_id, {}).values())
+
+    def discard(self, guild_id):
+        with self._lock:
+            self._members.pop(guild_id, None)
+            self._admin_roles.pop(guild_id, None)
+            self._owners.pop(guild_id, None)
@@ -4,24 +4,23 @@ Discord User Remover Bot - Runner Script
 Simple script to start the Streamlit application
 """
 
+import importlib.util
 import subprocess
 import sys
 import os
 
+# Import names of the packages in requirements.txt
+REQUIRED_PACKAGES = ["streamlit", "discord", "pandas", "openpyxl", "pyarrow", "dotenv"]
+
 def check_requirements():
-    """Check if required packages are installed"""
-    try:
-        import streamlit
-        import discord
-        import pandas
-        import openpyxl
-        from dotenv import load_dotenv
-        print("✅ All required packages are installed")
-        return True
-    except ImportError as e:
-        print(f"❌ Missing required package: {e}")
+    """Check if required packages are installed, without importing them"""
+    missing = [name for name in REQUIRED_PACKAGES if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing required packages: {', '.join(missing)}")
         print("Please run: pip install -r requirements.txt")
         return False
+    print("✅ All required packages are installed")
+    return True
 
 def check_env_file():
     """Check if .env file exists"""
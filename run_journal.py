@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+RUNS_DIR = os.getenv("DISCORD_RUNS_DIR", "runs")
+
+REMOVED = "removed"
+FAILED = "failed"
+# Never sent because the run was cancelled
+NOT_ATTEMPTED = "not_attempted"
+
+# Failure reasons worth retrying on resume; anything else is final
+TRANSIENT_PREFIXES = ("Rate limited", "Discord error", "Error:", "Missing from bulk ban response")
+
+
+def is_transient(reason):
+    """Check whether a failure reason may succeed if retried"""
+    return bool(reason) and reason.startswith(TRANSIENT_PREFIXES)
+
+
+class RunJournal:
+    """Append-only JSON-lines journal of the targets a run has processed
+
+    The first line records the run's targets and options; every outcome is
+    appended as it happens, so an interrupted run can be resumed from disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.run_id = None
+        self.entries = []
+        self.options = {}
+        self.created_at = None
+        self.finished_status = None
+        self.outcomes = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._needs_newline = False
+
+        if os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def create(cls, entries, options=None, directory=RUNS_DIR):
+        """Start a journal for a new run"""
+        os.makedirs(directory, exist_ok=True)
+        run_id = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        journal = cls(os.path.join(directory, f"{run_id}.jsonl"))
+        journal.run_id = run_id
+        journal.entries = list(entries)
+        journal.options = dict(options or {})
+        journal.created_at = time.time()
+        journal._append({
+            "type": "run",
+            "run_id": run_id,
+            "created_at": journal.created_at,
+            "entries": journal.entries,
+            "options": journal.options
+        })
+        return journal
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                self._needs_newline = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash can leave a partially written last line
+                    continue
+                kind = record.get("type")
+                if kind == "run":
+                    self.run_id = record["run_id"]
+                    self.created_at = record["created_at"]
+                    self.entries = record["entries"]
+                    self.options = record["options"]
+                elif kind == "outcome":
+                    self.outcomes[record["entry"]] = record
+                elif kind == "end":
+                    self.finished_status = record["status"]
+
+    def _append(self, record):
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                if self._needs_newline:
+                    self._file.write("\n")
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def record(self, entry, outcome, detail=None):
+        """Append one target's outcome"""
+        record = {"type": "outcome", "entry": entry, "outcome": outcome, "detail": detail, "ts": time.time()}
+        self.outcomes[entry] = record
+        self._append(record)
+
+    def finish(self, status):
+        """Mark the run as finished and close the file
+
+        The end record carries the run's counts, so ``JournalSummary`` can
+        list a finished run without replaying its outcomes.
+        """
+        self.finished_status = status
+        self._append({
+            "type": "end", "status": status, "ts": time.time(),
+            "removed": self.removed_count, "pending": len(self.pending())
+        })
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def pending(self, entries=None):
+        """Return the entries still to process: never attempted, or failed transiently"""
+        pending = []
+        for entry in self.entries if entries is None else entries:
+            record = self.outcomes.get(entry)
+            if record is None or record["outcome"] == NOT_ATTEMPTED or \
+                    (record["outcome"] == FAILED and is_transient(record["detail"])):
+                pending.append(entry)
+        return pending
+
+    @property
+    def removed_count(self):
+        return len([r for r in self.outcomes.values() if r["outcome"] == REMOVED])
+
+    @property
+    def resumable(self):
+        return bool(self.pending())
+
+
+def _last_line(f, block_size=4096):
+    """The last non-empty line of a binary file, read backwards from the end"""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    tail = b""
+    while position > 0 and b"\n" not in tail.rstrip(b"\n"):
+        step = min(block_size, position)
+        position -= step
+        f.seek(position)
+        tail = f.read(step) + tail
+    return tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+
+
+class JournalSummary:
+    """What the resume list shows of a journal, read from its first and last lines
+
+    A run that ended through ``RunJournal.finish`` records its counts in
+    the end record; only an interrupted run has its outcomes replayed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # A crash can leave a partially written first or last line
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                end = json.loads(_last_line(f))
+        except ValueError:
+            header = end = {}
+
+        if header.get("type") == "run" and end.get("type") == "end" and "pending" in end:
+            self.run_id = header["run_id"]
+            self.options = header["options"]
+            self.finished_status = end["status"]
+            self.removed_count = end["removed"]
+            self.pending_count = end["pending"]
+        else:
+            journal = RunJournal(path)
+            self.run_id = journal.run_id
+            self.options = journal.options
+            self.finished_status = journal.finished_status
+            self.removed_count = journal.removed_count
+            self.pending_count = len(journal.pending())
+
+    @property
+    def resumable(self):
+        return self.pending_count > 0
+
+
+def list_journals(directory=RUNS_DIR, summarize=JournalSummary):
+    """Summarize every journal in ``directory``, newest first
+
+    ``summarize(path)`` reads one journal; callers can pass a cached one.
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    journals = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".jsonl"):
+            try:
+                journals.append(summarize(os.path.join(directory, name)))
+            except Exception as e:
+                logging.error(f"Could not read run journal {name}: {str(e)}")
+    return journals
@@ -0,0 +1,25 @@
+import re
+
+# Discord snowflakes are 17-20 digit integers
+SNOWFLAKE_PATTERN = re.compile(r"^\d{17,20}$")
+
+# Snowflakes are signed 64-bit integers; larger 20-digit values are not IDs
+MAX_SNOWFLAKE = 2**63 - 1
+
+
+def is_snowflake(value):
+    """Check whether a string is a user ID that fits in a snowflake"""
+    return bool(SNOWFLAKE_PATTERN.match(value)) and int(value) <= MAX_SNOWFLAKE
+
+
+def is_user_id(entry):
+    """Check whether an uploaded entry is a user ID rather than a username"""
+    return isinstance(entry, int) and not isinstance(entry, bool) and 0 <= entry <= MAX_SNOWFLAKE
+
+
+def merge_targets(*lists):
+    """Combine target lists in order, keeping the first occurrence of each entry
+
+    A user named in several lists is only ever acted on once.
+    """
+    return list(dict.fromkeys(entry for entries in lists for entry in entries))
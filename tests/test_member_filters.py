@@ -0,0 +1,48 @@
+import pytest
+
+from benchmarks.synthetic import FIRST_MEMBER_ID, FIRST_ROLE_ID, Guild, synthetic_guild
+from member_filters import (
+    All, Any, HasNoRoles, JoinedBefore, LacksRoles, select_members, split_role_names, users_without_roles
+)
+from member_snapshot import build_member_snapshot
+
+
+@pytest.fixture
+def snapshot():
+    # Member 0 owns the server, member 1 is an administrator, member 7 is a bot;
+    # every third member has no roles
+    return build_member_snapshot(synthetic_guild(30))
+
+
+def test_selection_never_includes_protected_members(snapshot):
+    everyone = Any(HasNoRoles(), LacksRoles([FIRST_ROLE_ID + 999]))
+    selected = select_members(snapshot, everyone, bot_user_id=FIRST_MEMBER_ID + 2)
+    ids = set(selected["id"] - FIRST_MEMBER_ID)
+    assert ids.isdisjoint({0, 1, 7, 2})
+    assert len(ids) == 30 - 4
+
+
+def test_users_without_roles_excludes_the_owner(snapshot):
+    names = set(users_without_roles(snapshot)["name"])
+    # user0 owns the server and has no roles
+    assert names == {f"user{index}" for index in range(3, 30, 3)}
+
+
+def test_lacks_roles_uses_the_role_bitsets(snapshot):
+    # Synthetic members with roles have plain role number index % 50
+    role = FIRST_ROLE_ID + 5
+    selected = select_members(snapshot, All(LacksRoles([role]), JoinedBefore(0)), now=2_000_000_000)
+    assert "user5" not in set(selected["name"])
+    assert "user4" in set(selected["name"])
+
+
+def test_lacks_roles_needs_a_role():
+    with pytest.raises(ValueError):
+        LacksRoles([])
+    assert split_role_names(" , ") == []
+    assert split_role_names("Member, 123 ,") == ["Member", "123"]
+
+
+def test_empty_snapshot_selects_nobody():
+    snapshot = build_member_snapshot(Guild([]), [])
+    assert len(select_members(snapshot, Any(HasNoRoles(), LacksRoles([FIRST_ROLE_ID])))) == 0
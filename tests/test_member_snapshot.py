@@ -0,0 +1,116 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import FIRST_MEMBER_ID, Guild, Member, synthetic_guild
+from file_loader import ColumnStream
+from member_snapshot import build_member_snapshot, plan_targets
+from safety import MAX_SNOWFLAKE, is_user_id
+
+BOT_USER_ID = 42
+
+
+def reasons(plan):
+    return dict(zip(plan["entry"], plan["reason"]))
+
+
+def guild_with(*names):
+    """Guild whose members have the given ``(username, display_name)`` pairs, none protected"""
+    guild = Guild([])
+    guild.owner_id = 1
+    everyone = guild.default_role
+    guild.members = [
+        Member(guild, FIRST_MEMBER_ID + index, name, [everyone])
+        for index, (name, _) in enumerate(names)
+    ]
+    for member, (_, display_name) in zip(guild.members, names):
+        member.display_name = display_name
+    return guild
+
+
+def test_empty_snapshot_keeps_column_types():
+    snapshot = build_member_snapshot(Guild([]), [])
+    assert len(snapshot) == 0
+    assert snapshot["name"].dtype == object
+    assert snapshot["id"].dtype == "int64"
+    assert snapshot["admin"].dtype == bool
+
+
+@pytest.mark.parametrize("entries", [
+    [FIRST_MEMBER_ID + 1, FIRST_MEMBER_ID + 2],
+    ["user1", FIRST_MEMBER_ID + 2],
+])
+def test_empty_snapshot_reports_every_entry_not_found(entries):
+    plan = plan_targets(build_member_snapshot(Guild([]), []), entries, BOT_USER_ID)
+    assert plan["entry"].tolist() == entries
+    assert plan["reason"].tolist() == ["User not found"] * len(entries)
+    assert plan["user_id"].isna().all()
+
+
+def test_oversized_ids_are_not_user_ids():
+    assert is_user_id(MAX_SNOWFLAKE)
+    assert not is_user_id(MAX_SNOWFLAKE + 1)
+    assert not is_user_id(True)
+
+    stream = ColumnStream("User ID", "id", [str(MAX_SNOWFLAKE), "99999999999999999999", str(FIRST_MEMBER_ID)])
+    assert [entry for chunk in stream for entry in chunk] == [MAX_SNOWFLAKE, FIRST_MEMBER_ID]
+    assert stream.skipped == 1
+
+
+def test_oversized_id_is_rejected_without_overflow():
+    snapshot = build_member_snapshot(synthetic_guild(10))
+    plan = plan_targets(snapshot, [99999999999999999999, FIRST_MEMBER_ID + 2], BOT_USER_ID)
+    assert reasons(plan) == {99999999999999999999: "User not found", FIRST_MEMBER_ID + 2: None}
+
+
+def test_duplicate_entries_are_rejected_after_the_first():
+    snapshot = build_member_snapshot(synthetic_guild(10))
+    entries = ["user2", "USER2", FIRST_MEMBER_ID + 2, "user3"]
+    plan = plan_targets(snapshot, entries, BOT_USER_ID)
+
+    assert plan["entry"].tolist() == entries
+    assert plan["reason"].tolist() == [None, "Duplicate of user2", "Duplicate of user2", None]
+    assert plan["user_id"].tolist() == [FIRST_MEMBER_ID + 2, FIRST_MEMBER_ID + 2, FIRST_MEMBER_ID + 2, FIRST_MEMBER_ID + 3]
+
+
+def test_shared_display_name_is_ambiguous():
+    guild = guild_with(("alice", "Sam"), ("bob", "Sam"), ("carol", "Carol C"))
+    plan = plan_targets(build_member_snapshot(guild), ["sam", "Carol C", "nobody"], BOT_USER_ID)
+    assert reasons(plan) == {
+        "sam": "Ambiguous: matches 2 members",
+        "Carol C": None,
+        "nobody": "User not found",
+    }
+
+
+def test_username_takes_precedence_over_display_names():
+    # "sam" is one member's username and another's display name
+    guild = guild_with(("sam", "Sam"), ("bob", "Sam"))
+    plan = plan_targets(build_member_snapshot(guild), ["sam"], BOT_USER_ID)
+    assert plan["reason"].tolist() == [None]
+    assert plan["user_id"].tolist() == [FIRST_MEMBER_ID]
+
+
+def test_safety_masks():
+    # synthetic_guild: member 0 owns the server, member 1 is an administrator, member 7 is a bot
+    guild = synthetic_guild(10)
+    snapshot = build_member_snapshot(guild)
+    entries = ["user0", "user1", "user7", "user8", FIRST_MEMBER_ID + 9]
+    plan = plan_targets(snapshot, entries, FIRST_MEMBER_ID + 8)
+    assert reasons(plan) == {
+        "user0": "Cannot remove server owner",
+        "user1": "Cannot remove administrators",
+        "user7": "Cannot remove bots",
+        "user8": "Cannot remove bot",
+        FIRST_MEMBER_ID + 9: None,
+    }
+
+
+def test_admin_role_protects_members_whatever_other_roles_they_have():
+    guild = synthetic_guild(3000)
+    snapshot = build_member_snapshot(guild)
+    admins = snapshot.loc[snapshot["admin"] & ~snapshot["owner"], "name"].tolist()
+    assert admins == ["user1", "user1001", "user2001"]
+
+    plan = plan_targets(snapshot, admins, BOT_USER_ID)
+    assert set(plan["reason"]) == {"Cannot remove administrators"}
+    assert pd.api.types.is_integer_dtype(plan["user_id"])